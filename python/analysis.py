@@ -0,0 +1,121 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+import game
+import game_record
+from bitboard import BitBoard, to_pos, to_square
+from engine import Engine
+
+BLUNDER_DROP = 2  # a score drop of about one winning stone
+
+worker_engine = None
+
+
+class Position:
+    """A position to analyse once, with every move played from it and where it occurred."""
+
+    def __init__(self, board: BitBoard):
+        self.board = board
+        self.played = set()
+        # (game number, round index, half-move index in the round, move played)
+        self.occurrences = []
+
+
+def collect_positions(matches):
+    """Replays matches and returns the distinct positions before every move, keyed by hash."""
+    positions = {}
+    count = 0
+    for match in matches:
+        board = game.Board(match.get('winning_points', 3))
+        for round_index, record in enumerate(match['rounds']):
+            board.set_color(record['color'])
+            for ply, move in enumerate(record['moves']):
+                bitboard = BitBoard.from_board(board)
+                position = positions.get(bitboard.hash)
+                if position is None:
+                    position = positions[bitboard.hash] = Position(bitboard)
+                square = to_square(tuple(move))
+                position.played.add(square)
+                position.occurrences.append((match['game'], round_index, ply, square))
+                count += 1
+                board.perform_move(tuple(move))
+            if 'from_right' in record:
+                board.reset(from_right=record['from_right'])
+    return positions, count
+
+
+def init_worker(table_megabytes):
+    global worker_engine
+    worker_engine = Engine(table_megabytes)
+
+
+def score_move(board, move, depth):
+    """Score of move searched alone to depth by a cleared engine, so that no move profits from
+    the table entries or history of another search."""
+    worker_engine.clear()
+    return worker_engine.think(board, depth=depth, root_moves=(move, ))[-1][1]
+
+
+def analyse(task):
+    """Searches a position for its best move within limits, then scores that move and every
+    other move played from it alike, each to the depth that search completed. Scores are from
+    the view of the side to move. Returns the move scores and whether the best move was
+    corrected.
+
+    The first search may have seen a transposition with deeper table entries, so a played
+    move can still score above its best move alone. That move is then taken as the best.
+    """
+    key, board, played, limits = task
+    depth, _, best = worker_engine.think(board, **limits)[-1]
+    played_scores = {move: score_move(board, move, depth) for move in dict.fromkeys((best, *played))}
+    top = max(played_scores, key=played_scores.get)
+    corrected = played_scores[top] > played_scores[best]
+    if corrected:
+        best = top
+    return key, best, played_scores[best], depth, played_scores, corrected
+
+
+def run(path, limits, workers=None, table_megabytes=16, stream=sys.stdout):
+    """Analyses every position of the games in path over a process pool and writes a JSON line
+    per move played as soon as its position is done. Returns the summary."""
+    start = time.perf_counter()
+    positions, count = collect_positions(game_record.read_matches(path))
+    tasks = ((key, position.board, tuple(position.played), limits) for key, position in positions.items())
+    blunders = corrections = 0
+    with multiprocessing.Pool(workers, init_worker, (table_megabytes, )) as pool:
+        for key, best, score, depth, played_scores, corrected in pool.imap_unordered(analyse, tasks):
+            corrections += corrected
+            for game_number, round_index, ply, move in positions[key].occurrences:
+                drop = score - played_scores[move]
+                blunders += drop >= BLUNDER_DROP
+                stream.write(json.dumps({
+                    'game': game_number, 'round': round_index, 'ply': ply, 'position': key,
+                    'played': to_pos(move), 'best': to_pos(best), 'depth': depth,
+                    'score': score, 'played_score': played_scores[move], 'drop': drop}) + '\n')
+            stream.flush()
+    return {'moves': count, 'positions': len(positions), 'blunders': blunders, 'corrections': corrections,
+            'seconds': time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score every move of stored games against the engine')
+    parser.add_argument('games', help='JSON lines of tournament.py or a game record file')
+    parser.add_argument('--depth', type=int, default=None, help='fixed depth per position')
+    parser.add_argument('--nodes', type=int, default=None, help='nodes per search')
+    parser.add_argument('--workers', type=int, default=None, help='processes, all cores by default')
+    parser.add_argument('--table-megabytes', type=int, default=16)
+    parser.add_argument('--output', help='file for the JSON lines instead of stdout')
+    args = parser.parse_args()
+    if args.depth is None and args.nodes is None:
+        parser.error('give --depth or --nodes')
+    output = open(args.output, 'w') if args.output else sys.stdout
+    summary = run(args.games, {'depth': args.depth, 'node_limit': args.nodes}, args.workers,
+                  args.table_megabytes, output)
+    if args.output:
+        output.close()
+    print(f'{summary["moves"]} moves, {summary["positions"]} distinct positions, {summary["blunders"]} blunders '
+          f'(drop >= {BLUNDER_DROP}), {summary["corrections"]} best moves corrected in {summary["seconds"]:.1f}s',
+          file=sys.stderr)
@@ -0,0 +1,100 @@
+import numpy as np
+
+from engine import Engine
+from bitboard import BitBoard, BLEN, SQUARES, FST, SND, RAYS, STRAIGHT, RANGES, GOAL_MASKS, SQUARE_COLORS
+
+# squares past the board edge are looked up at OFF_BOARD, which counts as occupied
+OFF_BOARD = SQUARES
+MAX_STEPS = BLEN - 1
+NO_OWNER = -1
+WIN_SCORE = Engine.INF  # scored when the side to move can win right away
+
+# RAY_SQUARES[player, square, direction, step] is RAYS padded with OFF_BOARD
+RAY_SQUARES = np.full((2, SQUARES, 3, MAX_STEPS), OFF_BOARD, dtype=np.int64)
+for player in (FST, SND):
+    for square in range(SQUARES):
+        for direction, ray in enumerate(RAYS[player][square]):
+            RAY_SQUARES[player, square, direction, :len(ray)] = ray
+RANGE_BY_LEVEL = np.array(RANGES)
+# one bit per board color, none for OFF_BOARD
+COLOR_BITS = np.array([1 << color for color in SQUARE_COLORS] + [0], dtype=np.int64)
+IS_GOAL = np.array([[bool(GOAL_MASKS[player] >> square & 1) for square in range(SQUARES)] + [False]
+                    for player in (FST, SND)])
+POPCOUNT = np.array([bin(value).count('1') for value in range(1 << BLEN)])
+STEPS = np.arange(MAX_STEPS)
+PLAYER_AXIS = np.array([FST, SND]).reshape(1, 2, 1)
+
+
+def encode(board: BitBoard):
+    """Snapshot of the position on board as one row for PositionBatch."""
+    color = -1 if board.current_color is None else board.current_color
+    return (*board.stones[FST], *board.stones[SND], *board.sumo_levels[FST], *board.sumo_levels[SND],
+            board.current_player, color, board.round_over)
+
+
+class PositionBatch:
+    """Array encoding of a batch of positions from encode.
+
+    stones and levels have the shape (positions, 2, 8) and are indexed like BitBoard.stones
+    and BitBoard.sumo_levels. The planes owner and cell_level are indexed by square, with an
+    extra OFF_BOARD column, and hold the player and sumo level of the stone on each square.
+    """
+
+    def __init__(self, rows):
+        rows = np.array(rows, dtype=np.int64).reshape(-1, 4 * BLEN + 3)
+        count = len(rows)
+        self.stones = rows[:, :2 * BLEN].reshape(count, 2, BLEN)
+        self.levels = rows[:, 2 * BLEN:4 * BLEN].reshape(count, 2, BLEN)
+        self.player = rows[:, 4 * BLEN]
+        self.color = rows[:, 4 * BLEN + 1]
+        self.round_over = rows[:, 4 * BLEN + 2].astype(bool)
+        positions = np.arange(count)[:, None, None]
+        self.owner = np.full((count, SQUARES + 1), NO_OWNER)
+        self.owner[positions, self.stones] = PLAYER_AXIS
+        self.owner[:, OFF_BOARD] = 2
+        self.cell_level = np.zeros((count, SQUARES + 1), dtype=np.int64)
+        self.cell_level[positions, self.stones] = self.levels
+
+    def __len__(self):
+        return len(self.player)
+
+
+def stone_features(batch: PositionBatch):
+    """Returns (can_win, reachable_colors) of every stone, both shaped (positions, 2, 8), as
+    BitBoard.stone_features computes them one stone at a time."""
+    count = len(batch)
+    positions = np.arange(count)[:, None, None, None, None]
+    rays = RAY_SQUARES[PLAYER_AXIS, batch.stones]  # (positions, 2, 8, direction, step)
+    free = batch.owner[positions, rays] == NO_OWNER
+    max_range = RANGE_BY_LEVEL[batch.levels][..., None, None]
+    reach = np.logical_and.accumulate(free, axis=-1) & (STEPS < max_range)
+    can_win = (reach & IS_GOAL[PLAYER_AXIS[..., None, None], rays]).any(axis=(-2, -1))
+    colors = np.bitwise_or.reduce(np.where(reach, COLOR_BITS[rays], 0), axis=(-2, -1))
+
+    # a sumo pushes a row of weaker opponent stones, at most as long as its level, onto a free square
+    straight = rays[..., STRAIGHT, :]
+    levels = batch.levels[..., None]
+    pushable = ((batch.owner[positions[..., 0], straight] == 1 - PLAYER_AXIS[..., None])
+                & (batch.cell_level[positions[..., 0], straight] < levels))
+    row = np.logical_and.accumulate(pushable, axis=-1)
+    straight_free = free[..., STRAIGHT, :]
+    push = np.zeros(batch.levels.shape, dtype=bool)
+    for pushed in range(1, len(RANGES) - 1):
+        push |= row[..., pushed - 1] & straight_free[..., pushed] & (pushed <= batch.levels)
+    push &= RANGE_BY_LEVEL[batch.levels] > 0
+    colors |= np.where(push, COLOR_BITS[straight[..., 0]], 0)
+    return can_win, POPCOUNT[colors]
+
+
+def evaluate(batch: PositionBatch):
+    """Engine.score_position of every position in batch, as float array."""
+    can_win, reachable_colors = stone_features(batch)
+    positions = np.arange(len(batch))
+    player, other = batch.player, 1 - batch.player
+    color = np.maximum(batch.color, 0)
+    winning_stones = can_win.sum(axis=-1)
+    color_sums = reachable_colors.sum(axis=-1)
+    scores = (winning_stones[positions, player] - winning_stones[positions, other]
+              + color_sums[positions, player] / 8 - color_sums[positions, other] / 8)
+    scores = np.where(can_win[positions, player, color], WIN_SCORE, scores)
+    return np.where(batch.round_over | (batch.color < 0), 0, scores)
@@ -0,0 +1,279 @@
+import argparse
+import random
+import time
+import timeit
+from copy import deepcopy
+
+import game
+import engine
+import draw
+import parallel
+import batch_eval
+import opening_book
+from bitboard import BitBoard
+
+# (first color, moves) of fixed benchmark positions, openings first
+POSITIONS = [(color, []) for color in range(game.BLEN)] + [
+    (0, [(5, 0), (4, 5), (5, 6), (4, 3)]),
+    (3, [(3, 3), (4, 0)]),
+    (6, [(6, 7), (2, 5), (6, 0), (3, 2)]),
+    (0, [(5, 0), (1, 1), (6, 7), (3, 2), (5, 6), (2, 3)]),
+]
+
+
+def bench_position(color, moves):
+    board = game.Board()
+    board.set_color(color)
+    for move in moves:
+        board.perform_move(move)
+    return board
+
+
+def bench_positions():
+    return [bench_position(color, moves) for color, moves in POSITIONS]
+
+
+def timed_search(bot, board, depth):
+    start = time.perf_counter()
+    score = bot.search(board, depth, 0, -bot.INF, bot.INF)
+    return score, time.perf_counter() - start
+
+
+def symmetry(depth):
+    """Searches every position and then its rotated twin with one engine, as in self-play."""
+    print(f'{"table keys":<12}{"hit rate":>10}{"hits":>10}{"nodes":>10}{"nodes/s":>10}')
+    for symmetric_table in (False, True):
+        bot = engine.Engine(symmetric_table=symmetric_table)
+        elapsed = 0
+        for board in bench_positions():
+            bitboard = BitBoard.from_board(board)
+            for position in (bitboard, bitboard.mirrored()):
+                bot.table.new_search()
+                elapsed += timed_search(bot, position, depth)[1]
+        name = 'canonical' if symmetric_table else 'plain'
+        print(f'{name:<12}{bot.table.hit_rate():>10.1%}{bot.table.hits:>10}{bot.nodes:>10}'
+              f'{bot.nodes / elapsed:>10.0f}')
+
+
+def ordering(time_to_calc, depth):
+    """Depth reached in time_to_calc milliseconds and nodes to a fixed depth, with and without
+    killer, history and principal variation ordering."""
+    print(f'{"ordering":<10}{"avg depth":>10}{"nodes":>10}{"first cut":>10}')
+    for move_ordering in (False, True):
+        depths, nodes, first_move = [], 0, []
+        for board in bench_positions():
+            bot = engine.Engine(move_ordering=move_ordering)
+            depths.append(bot.think(BitBoard.from_board(board), time_to_calc)[-1][0])
+            bot = engine.Engine(move_ordering=move_ordering)
+            bot.get_move(board, depth=depth)
+            nodes += bot.nodes
+            first_move.append(bot.first_move_cutoff_rate())
+        name = 'on' if move_ordering else 'off'
+        print(f'{name:<10}{sum(depths) / len(depths):>10.2f}{nodes:>10}{sum(first_move) / len(first_move):>10.1%}')
+
+
+def windows(depth):
+    """Nodes and time to a fixed depth with principal variation search and aspiration windows."""
+    print(f'{"pvs":<8}{"aspiration":<12}{"nodes":>10}{"re-searches":>12}{"seconds":>10}')
+    for pvs, aspiration in ((False, False), (True, False), (False, True), (True, True)):
+        nodes, researches, elapsed = 0, 0, 0
+        for board in bench_positions():
+            bot = engine.Engine(pvs=pvs, aspiration=aspiration)
+            start = time.perf_counter()
+            bot.get_move(board, depth=depth)
+            elapsed += time.perf_counter() - start
+            nodes += bot.nodes
+            researches += bot.researches
+        print(f'{str(pvs):<8}{str(aspiration):<12}{nodes:>10}{researches:>12}{elapsed:>10.2f}')
+
+
+def walk_positions(count, seed=0, frame=BitBoard.from_board):
+    """count positions from random games, each turned into frame(board): BitBoards with empty
+    feature caches by default, deepcopy gives game.Board copies as a GUI shows them."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = bench_position(rng.randrange(game.BLEN), [])
+        while not board.round_over and len(positions) < count:
+            positions.append(frame(board))
+            board.perform_move(rng.choice(board.get_legal_moves()))
+    return positions
+
+
+def batch(sizes, repeat):
+    """Microseconds per position of Engine.score_position and of batch_eval at several batch sizes."""
+    bot = engine.Engine()
+    print(f'{"batch":<8}{"scalar us":>12}{"batch us":>12}{"speedup":>10}')
+    for size in sizes:
+        positions = walk_positions(size)
+
+        def scalar_round():
+            for board in positions:
+                board.features = [[None] * game.BLEN, [None] * game.BLEN]
+                bot.score_position(board)
+
+        def batch_round():
+            batch_eval.evaluate(batch_eval.PositionBatch([batch_eval.encode(board) for board in positions]))
+        scalar = 1e6 / best_rate(lambda: [scalar_round() for _ in range(repeat)], repeat * size)
+        batched = 1e6 / best_rate(lambda: [batch_round() for _ in range(repeat)], repeat * size)
+        print(f'{size:<8}{scalar:>12.1f}{batched:>12.1f}{scalar / batched:>10.2f}')
+
+
+def rendering(count):
+    """Frames per second of drawing a sequence of positions onto a pygame surface: the whole
+    image drawn from scratch, the whole image from cached cells and only the changed cells."""
+    import pygame
+    import gui
+    frames = walk_positions(count, frame=deepcopy)
+    surface = pygame.Surface((draw.BOARD_PIXELS, ) * 2)
+
+    def full_frames(draw_board):
+        def frames_round():
+            for board in frames:
+                image = pygame.image.frombuffer(draw_board(board).tobytes(), (draw.BOARD_PIXELS, ) * 2, 'RGB')
+                surface.blit(image, (0, 0))
+        return frames_round
+
+    view = gui.BoardView(surface)
+
+    def dirty_round():
+        view.invalidate()
+        for board in frames:
+            view.draw(board)
+    dirty_round()  # fills the sprite caches, as the first frames of a game do
+    print(f'{"path":<16}{"frames/s":>10}')
+    for name, frames_round in (('uncached', full_frames(draw.draw_board_uncached)),
+                               ('cached cells', full_frames(draw.draw_board)), ('dirty cells', dirty_round)):
+        print(f'{name:<16}{best_rate(frames_round, len(frames)):>10.0f}')
+
+
+def book(path, repeat):
+    """Microseconds per book lookup, on its own and through Engine.get_move. Only positions
+    in the book are timed through get_move, the others would time a full search."""
+    loaded = opening_book.OpeningBook.load(path)
+    positions = opening_book.opening_positions(1)
+    in_book = [board for board in positions if loaded.lookup(board) is not None]
+    print(f'{len(loaded)} book positions, {len(in_book)} of {len(positions)} opening positions found')
+
+    def lookup_round():
+        for board in positions:
+            loaded.lookup(board)
+    print(f'lookup us: {1e6 / best_rate(lambda: [lookup_round() for _ in range(repeat)], repeat * len(positions)):.2f}')
+    if not in_book:
+        return
+    bot = engine.Engine(book=loaded)
+    boards = [board.to_board() for board in in_book]
+
+    def get_move_round():
+        for board in boards:
+            bot.get_move(board, depth=8)
+    print(f'get_move us: {1e6 / best_rate(get_move_round, len(boards)):.1f} over the {len(boards)} book positions')
+
+
+def sumo_board():
+    board = game.Board()
+    board.fst_player.stones = [(4, 4), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)]
+    board.snd_player.stones = [(3, 4), (2, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)]
+    board.occupied = [[any((row, col) in player.stones for player in (board.fst_player, board.snd_player))
+                       for col in range(game.BLEN)] for row in range(game.BLEN)]
+    board.fst_player.sumo_levels[0] = 2
+    board.set_color(0)
+    return board
+
+
+def best_rate(function, count, rounds=5):
+    """Calls per second of the fastest of several rounds, to filter out machine noise."""
+    best = min(timeit.repeat(function, number=1, repeat=rounds))
+    return count / best
+
+
+def make_unmake(repeat):
+    """Throughput of BitBoard.do_move/undo_move and of move application and sumo push checks
+    on game.Board."""
+    boards = [BitBoard.from_board(board) for board in bench_positions()]
+    moves = [(board, board.get_legal_moves()) for board in boards]
+
+    def make_unmake_round():
+        for _ in range(repeat):
+            for board, board_moves in moves:
+                for move in board_moves:
+                    board.undo_move(board.do_move(move))
+    pairs = repeat * sum(len(board_moves) for _, board_moves in moves)
+    print(f'do_move/undo_move pairs/s: {best_rate(make_unmake_round, pairs):.0f}')
+
+    boards = bench_positions()
+    moves = [(board, board.get_classified_moves()) for board in boards]
+
+    def apply_revert_round():
+        for _ in range(repeat):
+            for board, board_moves in moves:
+                for move in board_moves:
+                    board.revert_move(board.apply_move(move))
+    print(f'apply_move/revert_move pairs/s: {best_rate(apply_revert_round, pairs):.0f}')
+
+    board = sumo_board()
+
+    def sumo_round():
+        for _ in range(repeat):
+            board.get_legal_moves()
+    print(f'get_legal_moves with sumo push/s: {best_rate(sumo_round, repeat):.0f}')
+
+
+def scaling(depth, worker_counts):
+    """Time to a fixed depth over all benchmark positions with root moves split over workers."""
+    print(f'{"workers":<10}{"seconds":>10}{"nodes":>10}{"nodes/s":>10}{"speedup":>10}')
+    single = None
+    for workers in worker_counts:
+        bot = parallel.ParallelEngine(workers)
+        bot.start()
+        nodes, elapsed = 0, 0
+        for board in bench_positions():
+            start = time.perf_counter()
+            bot.get_move(board, depth=depth)
+            elapsed += time.perf_counter() - start
+            nodes += bot.nodes
+        bot.close()
+        single = single or elapsed
+        print(f'{workers:<10}{elapsed:>10.2f}{nodes:>10}{nodes / elapsed:>10.0f}{single / elapsed:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Kamisado engine benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    symmetry_parser = commands.add_parser('symmetry', help='table hit rate with and without symmetric keys')
+    symmetry_parser.add_argument('--depth', type=int, default=4)
+    scaling_parser = commands.add_parser('scaling', help='parallel root search time to depth')
+    scaling_parser.add_argument('--depth', type=int, default=5)
+    scaling_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    ordering_parser = commands.add_parser('ordering', help='depth reached with and without move ordering')
+    ordering_parser.add_argument('--time', type=int, default=1000, help='milliseconds per position')
+    ordering_parser.add_argument('--depth', type=int, default=6)
+    windows_parser = commands.add_parser('windows', help='principal variation search and aspiration windows')
+    windows_parser.add_argument('--depth', type=int, default=7)
+    batch_parser = commands.add_parser('batch', help='per position cost of scalar and batched evaluation')
+    batch_parser.add_argument('--sizes', type=int, nargs='+', default=[1, 8, 64, 512])
+    batch_parser.add_argument('--repeat', type=int, default=20)
+    book_parser = commands.add_parser('book', help='opening book lookup latency')
+    book_parser.add_argument('path', help='book written by opening_book.py build')
+    book_parser.add_argument('--repeat', type=int, default=100)
+    draw_parser = commands.add_parser('draw', help='frames per second of board rendering')
+    draw_parser.add_argument('--frames', type=int, default=60)
+    make_parser = commands.add_parser('makemove', help='make/unmake throughput')
+    make_parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    if args.command == 'symmetry':
+        symmetry(args.depth)
+    elif args.command == 'scaling':
+        scaling(args.depth, args.workers)
+    elif args.command == 'ordering':
+        ordering(args.time, args.depth)
+    elif args.command == 'windows':
+        windows(args.depth)
+    elif args.command == 'batch':
+        batch(args.sizes, args.repeat)
+    elif args.command == 'book':
+        book(args.path, args.repeat)
+    elif args.command == 'draw':
+        rendering(args.frames)
+    elif args.command == 'makemove':
+        make_unmake(args.repeat)
@@ -0,0 +1,498 @@
+import random
+
+import game
+
+BLEN = game.BLEN
+SQUARES = BLEN * BLEN
+
+FST, SND = 0, 1
+FORWARD = (-1, 1)  # row step of fst player (starting at the bottom) and snd player
+START_ROWS = (BLEN - 1, 0)
+DIAG_DIRECTIONS = (-1, 0, 1)
+STRAIGHT = DIAG_DIRECTIONS.index(0)
+
+RANGES = game.Board.SUMO_STATS['range']
+POINTS = game.Board.SUMO_STATS['points']
+
+
+def to_square(pos):
+    return pos[0] * BLEN + pos[1]
+
+
+def to_pos(square):
+    return divmod(square, BLEN)
+
+
+def mirror_square(square):
+    return SQUARES - 1 - square
+
+
+def row_mask(row):
+    return ((1 << BLEN) - 1) << (row * BLEN)
+
+
+def __build_rays():
+    rays, masks = [], []
+    for forward in FORWARD:
+        player_rays, player_masks = [], []
+        for square in range(SQUARES):
+            row, col = to_pos(square)
+            square_rays = []
+            for diag_direction in DIAG_DIRECTIONS:
+                ray = []
+                pos = row + forward, col + diag_direction
+                while game.Board.is_in_bounds(pos):
+                    ray.append(to_square(pos))
+                    pos = pos[0] + forward, pos[1] + diag_direction
+                square_rays.append(tuple(ray))
+            player_rays.append(tuple(square_rays))
+            player_masks.append(tuple(sum(1 << ray_square for ray_square in ray) for ray in square_rays))
+        rays.append(tuple(player_rays))
+        masks.append(tuple(player_masks))
+    return tuple(rays), tuple(masks)
+
+
+# RAYS[player][square][direction] lists the squares in front of square in moving order,
+# RAY_MASKS holds the same squares as occupancy mask
+RAYS, RAY_MASKS = __build_rays()
+GOAL_MASKS = tuple(row_mask(START_ROWS[1 - player]) for player in (FST, SND))
+# BEHIND_MASKS[player][square] holds the squares whose rays pass through square
+BEHIND_MASKS = tuple(tuple(RAY_MASKS[1 - player][square][0] | RAY_MASKS[1 - player][square][1] |
+                           RAY_MASKS[1 - player][square][2] for square in range(SQUARES)) for player in (FST, SND))
+SQUARE_COLORS = tuple(game.Board.get_board_color(to_pos(square)) for square in range(SQUARES))
+
+
+def __build_win_paths():
+    paths = []
+    for player in (FST, SND):
+        paths.append(tuple(tuple(tuple(RAY_MASKS[player][square][direction]
+                                       for direction, ray in enumerate(RAYS[player][square])
+                                       if ray and GOAL_MASKS[player] >> ray[-1] & 1 and len(ray) <= max_range)
+                                 for max_range in RANGES) for square in range(SQUARES)))
+    return tuple(paths)
+
+
+# WIN_PATHS[player][square][sumo_level] holds the masks of the rays from square that end on the
+# goal row within the range of the sumo level, a stone can win if one of them is empty
+WIN_PATHS = __build_win_paths()
+
+__zobrist_random = random.Random(0x4b616d69)
+STONE_KEYS = tuple(tuple(tuple(__zobrist_random.getrandbits(64) for _ in range(SQUARES)) for _ in range(BLEN))
+                   for _ in (FST, SND))
+SUMO_KEYS = tuple(tuple(tuple(__zobrist_random.getrandbits(64) for _ in POINTS) for _ in range(BLEN))
+                  for _ in (FST, SND))
+COLOR_KEYS = tuple(__zobrist_random.getrandbits(64) for _ in range(BLEN))
+SND_TO_MOVE_KEY = __zobrist_random.getrandbits(64)
+
+# BOARD_COLORS is invariant under a 180 degree rotation, so rotating the board and swapping
+# the players gives the same game. The mirror keys hash a position as its rotated twin.
+MIRROR_STONE_KEYS = tuple(tuple(tuple(STONE_KEYS[1 - player][color][mirror_square(square)] for square in range(SQUARES))
+                                for color in range(BLEN)) for player in (FST, SND))
+MIRROR_SUMO_KEYS = SUMO_KEYS[::-1]
+
+
+class MoveRecord:
+    """Everything undo_move needs to take back a move.
+
+    pushed is the number of stones moved by a sumo push, promoted_player and promoted_color
+    name the stone whose sumo level was raised by ending the round, if any, and stale holds
+    the stone features the move dropped.
+    """
+    __slots__ = ('old_color', 'old_player', 'start', 'old_hash', 'old_mirror_hash', 'pushed',
+                 'promoted_player', 'promoted_color', 'was_deadlock', 'stale')
+
+    def __init__(self, old_color, old_player, start, old_hash, old_mirror_hash):
+        self.old_color = old_color
+        self.old_player = old_player
+        self.start = start
+        self.old_hash = old_hash
+        self.old_mirror_hash = old_mirror_hash
+        self.pushed = 0
+        self.promoted_player = None
+        self.promoted_color = None
+        self.was_deadlock = False
+        self.stale = []
+
+
+class BitBoard:
+    """Search-friendly mirror of game.Board.
+
+    Players are indices (FST, SND), positions are square indices (row * 8 + col) and
+    occupancy is kept as one 64-bit mask per player. Moves passed to do_move must come
+    from get_legal_moves, they are not validated again. hash is the zobrist hash of
+    stones, sumo levels, player to move and current color, mirror_hash the hash of the
+    rotated position with swapped players. Both are kept up to date by do_move and
+    undo_move, table_key picks the smaller one so that both twins share a key.
+
+    stone_features caches the reach of every stone. do_move only drops the entries of
+    stones whose rays cross a square that changed, undo_move puts them back.
+    """
+
+    def __init__(self, winning_points=3):
+        self.winning_points = winning_points
+        self.turn_count = 0
+        self.round_over = False
+        self.winner = None
+        self.current_color = None
+        self.current_player = FST
+        self.stones = [[to_square((START_ROWS[FST], i)) for i in range(BLEN)],
+                       [to_square((START_ROWS[SND], i)) for i in reversed(range(BLEN))]]
+        self.sumo_levels = [[0] * BLEN, [0] * BLEN]
+        self.occupied = [0, 0]
+        self.cells = [None] * SQUARES
+        self.hash = 0
+        self.mirror_hash = 0
+        self.__index_stones()
+
+    def compute_hash(self, mirror=False):
+        stone_keys, sumo_keys = (MIRROR_STONE_KEYS, MIRROR_SUMO_KEYS) if mirror else (STONE_KEYS, SUMO_KEYS)
+        key = SND_TO_MOVE_KEY if (self.current_player == SND) != mirror else 0
+        if self.current_color is not None:
+            key ^= COLOR_KEYS[self.current_color]
+        for player in (FST, SND):
+            for color in range(BLEN):
+                key ^= stone_keys[player][color][self.stones[player][color]]
+                key ^= sumo_keys[player][color][self.sumo_levels[player][color]]
+        return key
+
+    def table_key(self):
+        """Returns the canonical hash and whether moves must be mirrored to match it."""
+        if self.mirror_hash < self.hash:
+            return self.mirror_hash, True
+        return self.hash, False
+
+    def mirrored(self):
+        bitboard = BitBoard(self.winning_points)
+        bitboard.turn_count = self.turn_count
+        bitboard.round_over = self.round_over
+        bitboard.winner = None if self.winner is None else 1 - self.winner
+        bitboard.current_color = self.current_color
+        bitboard.current_player = 1 - self.current_player
+        bitboard.stones = [[mirror_square(square) for square in self.stones[player]] for player in (SND, FST)]
+        bitboard.sumo_levels = [list(self.sumo_levels[player]) for player in (SND, FST)]
+        bitboard.__index_stones()
+        return bitboard
+
+    def __index_stones(self):
+        self.occupied = [0, 0]
+        self.cells = [None] * SQUARES
+        self.features = [[None] * BLEN, [None] * BLEN]
+        for player in (SND, FST):
+            for color in reversed(range(BLEN)):
+                square = self.stones[player][color]
+                self.occupied[player] |= 1 << square
+                self.cells[square] = color
+        self.hash = self.compute_hash()
+        self.mirror_hash = self.compute_hash(mirror=True)
+
+    @staticmethod
+    def from_board(board: game.Board):
+        bitboard = BitBoard(board.winning_points)
+        players = (board.fst_player, board.snd_player)
+        bitboard.turn_count = board.turn_count
+        bitboard.round_over = board.round_over
+        bitboard.winner = None if board.winner is None else players.index(board.winner)
+        bitboard.current_color = board.current_color
+        bitboard.current_player = players.index(board.current_player)
+        bitboard.stones = [[to_square(pos) for pos in player.stones] for player in players]
+        bitboard.sumo_levels = [list(player.sumo_levels) for player in players]
+        bitboard.__index_stones()
+        return bitboard
+
+    def to_board(self):
+        board = game.Board(self.winning_points)
+        players = (board.fst_player, board.snd_player)
+        for player, stones, sumo_levels in zip(players, self.stones, self.sumo_levels):
+            player.stones = [to_pos(square) for square in stones]
+            player.sumo_levels = list(sumo_levels)
+        board.occupied = [[bool((self.occupied[FST] | self.occupied[SND]) >> to_square((row, col)) & 1)
+                           for col in range(BLEN)] for row in range(BLEN)]
+        board.turn_count = self.turn_count
+        board.round_over = self.round_over
+        board.winner = None if self.winner is None else players[self.winner]
+        board.current_color = self.current_color
+        board.current_player = players[self.current_player]
+        return board
+
+    def get_points(self, player):
+        return sum(POINTS[level] for level in self.sumo_levels[player])
+
+    def __push_length(self, player, square, sumo_level):
+        """Number of stones a sumo on square pushes straight ahead, 0 if the push is illegal."""
+        own, other = self.occupied[player], self.occupied[1 - player]
+        other_levels = self.sumo_levels[1 - player]
+        pushed = 0
+        for push_square in RAYS[player][square][STRAIGHT]:
+            bit = 1 << push_square
+            if not (own | other) & bit:
+                return pushed
+            if own & bit or pushed >= sumo_level or other_levels[self.cells[push_square]] >= sumo_level:
+                return 0
+            pushed += 1
+        return 0
+
+    def stone_moves(self, player, color):
+        square = self.stones[player][color]
+        sumo_level = self.sumo_levels[player][color]
+        max_range = RANGES[sumo_level]
+        occupied = self.occupied[FST] | self.occupied[SND]
+        row = square >> 3
+        moves = []
+        for direction, (ray, mask) in enumerate(zip(RAYS[player][square], RAY_MASKS[player][square])):
+            blockers = mask & occupied
+            if not blockers:
+                moves.extend(ray[:max_range])
+                continue
+            if player == SND:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            distance = abs((blocker >> 3) - row)
+            moves.extend(ray[:min(distance - 1, max_range)])
+            if (distance == 1 and direction == STRAIGHT and sumo_level > 0 and max_range > 0
+                    and self.__push_length(player, square, sumo_level)):
+                moves.append(blocker)
+        return moves
+
+    def __ordered_moves(self, player, color, preferred, key):
+        """Generates the moves of stone_moves in search order, see iter_moves."""
+        square = self.stones[player][color]
+        sumo_level = self.sumo_levels[player][color]
+        max_range = RANGES[sumo_level]
+        if max_range == 0:
+            return
+        occupied = self.occupied[FST] | self.occupied[SND]
+        rays = RAYS[player][square]
+        row = square >> 3
+        reach = []
+        push_square = None
+        for direction, mask in enumerate(RAY_MASKS[player][square]):
+            blockers = mask & occupied
+            if not blockers:
+                reach.append(min(len(rays[direction]), max_range))
+                continue
+            if player == SND:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            distance = abs((blocker >> 3) - row)
+            reach.append(min(distance - 1, max_range))
+            if distance == 1 and direction == STRAIGHT and sumo_level > 0:
+                push_square = blocker
+        # a move onto the goal row is the longest one of its ray
+        goal = GOAL_MASKS[player]
+        done = []
+        for direction in (2, 1, 0):
+            if reach[direction] and goal >> rays[direction][reach[direction] - 1] & 1:
+                done.append(rays[direction][reach[direction] - 1])
+                yield done[-1]
+        can_push = None
+        for move in preferred:
+            if move is None or move in done:
+                continue
+            if move == push_square:
+                can_push = self.__push_length(player, square, sumo_level) > 0
+                if not can_push:
+                    continue
+            elif not any(move in ray[:length] for ray, length in zip(rays, reach)):
+                continue
+            done.append(move)
+            yield move
+        rest = []
+        for distance in range(max(reach[0], reach[1], reach[2], 1), 0, -1):
+            for direction in (2, 1, 0):
+                if distance <= reach[direction]:
+                    move = rays[direction][distance - 1]
+                    if move in done:
+                        continue
+                elif distance == 1 and direction == STRAIGHT and push_square is not None and push_square not in done:
+                    if can_push is None:
+                        can_push = self.__push_length(player, square, sumo_level) > 0
+                    if not can_push:
+                        continue
+                    move = push_square
+                else:
+                    continue
+                if key is None:
+                    yield move
+                else:
+                    rest.append(move)
+        if rest:
+            yield from sorted(rest, key=key)
+
+    def iter_moves(self, preferred=(), key=None, color=None, player=None):
+        """Lazily generates the legal moves in search order: winning moves, then the legal
+        ones of preferred (table or killer moves), then the rest, longest first. Each move
+        comes once, and a move is only generated once the caller asks for it. With key, the
+        rest is collected and stably sorted by it after the preferred moves are used up."""
+        if color is None:
+            color = self.current_color
+        if player is None:
+            player = self.current_player
+        if self.round_over or self.current_color is None:
+            return iter(())
+        return self.__ordered_moves(player, color, preferred, key)
+
+    def has_legal_move(self, player, color):
+        """Whether iter_moves would generate anything, without ordering: only the first square
+        of each ray and a straight push need to be looked at."""
+        square = self.stones[player][color]
+        sumo_level = self.sumo_levels[player][color]
+        if RANGES[sumo_level] == 0:
+            return False
+        occupied = self.occupied[FST] | self.occupied[SND]
+        for direction, ray in enumerate(RAYS[player][square]):
+            if ray and not occupied >> ray[0] & 1:
+                return True
+            if ray and direction == STRAIGHT and sumo_level > 0 and self.__push_length(player, square, sumo_level):
+                return True
+        return False
+
+    def get_legal_moves(self, color=None, player=None):
+        if color is None:
+            color = self.current_color
+        if player is None:
+            player = self.current_player
+        if self.round_over or self.current_color is None:
+            return []
+        return self.stone_moves(player, color)
+
+    def has_winning_move(self, player, color=None):
+        if color is None:
+            color = self.current_color
+        if self.round_over or self.current_color is None:
+            return False
+        occupied = self.occupied[FST] | self.occupied[SND]
+        for path in WIN_PATHS[player][self.stones[player][color]][self.sumo_levels[player][color]]:
+            if not path & occupied:
+                return True
+        return False
+
+    def winning_threats(self, player):
+        """Bit set of the colors of player whose stones could move onto the goal row."""
+        occupied = self.occupied[FST] | self.occupied[SND]
+        paths = WIN_PATHS[player]
+        levels = self.sumo_levels[player]
+        threats = 0
+        for color, square in enumerate(self.stones[player]):
+            for path in paths[square][levels[color]]:
+                if not path & occupied:
+                    threats |= 1 << color
+                    break
+        return threats
+
+    def stone_features(self, player, color):
+        """Returns (reach, can_win, reachable_colors) of a stone, ignoring whose turn it is.
+
+        reach is the mask of the stone's move targets, can_win tells if one of them is on
+        the goal row and reachable_colors counts the board colors among them.
+        """
+        features = self.features[player][color]
+        if features is None:
+            moves = self.stone_moves(player, color)
+            reach = 0
+            for move in moves:
+                reach |= 1 << move
+            features = reach, bool(reach & GOAL_MASKS[player]), len({SQUARE_COLORS[move] for move in moves})
+            self.features[player][color] = features
+        return features
+
+    def __invalidate_features(self, changed, stale, all_stones=False):
+        """Drops the features of stones on or behind changed squares, appending
+        (player, color, old features) of each to stale."""
+        for player in (FST, SND):
+            player_features = self.features[player]
+            if all_stones:
+                affected = self.occupied[player]
+            else:
+                affected = changed
+                squares = changed
+                while squares:
+                    low = squares & -squares
+                    affected |= BEHIND_MASKS[player][low.bit_length() - 1]
+                    squares ^= low
+                affected &= self.occupied[player]
+            while affected:
+                low = affected & -affected
+                color = self.cells[low.bit_length() - 1]
+                stale.append((player, color, player_features[color]))
+                player_features[color] = None
+                affected ^= low
+
+    def __move_stone(self, player, color, target):
+        source = self.stones[player][color]
+        self.occupied[player] ^= (1 << source) | (1 << target)
+        self.cells[source] = None
+        self.cells[target] = color
+        self.stones[player][color] = target
+        self.hash ^= STONE_KEYS[player][color][source] ^ STONE_KEYS[player][color][target]
+        self.mirror_hash ^= MIRROR_STONE_KEYS[player][color][source] ^ MIRROR_STONE_KEYS[player][color][target]
+
+    def __process_round_winner(self, player, color, record):
+        record.promoted_player, record.promoted_color = player, color
+        self.round_over = True
+        level = self.sumo_levels[player][color]
+        self.hash ^= SUMO_KEYS[player][color][level] ^ SUMO_KEYS[player][color][level + 1]
+        self.mirror_hash ^= MIRROR_SUMO_KEYS[player][color][level] ^ MIRROR_SUMO_KEYS[player][color][level + 1]
+        self.sumo_levels[player][color] = level + 1
+        if self.get_points(player) >= self.winning_points:
+            self.winner = player
+
+    def __pass_turn(self, square):
+        turn_key = COLOR_KEYS[self.current_color] ^ COLOR_KEYS[SQUARE_COLORS[square]] ^ SND_TO_MOVE_KEY
+        self.hash ^= turn_key
+        self.mirror_hash ^= turn_key
+        self.current_color = SQUARE_COLORS[square]
+        self.current_player = 1 - self.current_player
+
+    def do_move(self, target):
+        """Applies a move from get_legal_moves and returns the MoveRecord needed by undo_move."""
+        player, color = self.current_player, self.current_color
+        record = MoveRecord(color, player, self.stones[player][color], self.hash, self.mirror_hash)
+        start = record.start
+        landing = target
+        changed = (1 << start) | (1 << target)
+        if (self.occupied[FST] | self.occupied[SND]) >> target & 1:
+            pushed = record.pushed = self.__push_length(player, start, self.sumo_levels[player][color])
+            ray = RAYS[player][start][STRAIGHT]
+            landing = ray[pushed]
+            for index in reversed(range(pushed)):
+                self.__move_stone(1 - player, self.cells[ray[index]], ray[index + 1])
+                changed |= 1 << ray[index + 1]
+            self.__move_stone(player, color, target)
+        else:
+            self.__move_stone(player, color, target)
+            if GOAL_MASKS[player] >> target & 1:
+                self.turn_count += 1
+                self.__process_round_winner(player, color, record)
+                self.__invalidate_features(changed, record.stale, all_stones=True)
+                return record
+        self.__invalidate_features(changed, record.stale)
+        self.turn_count += 1
+        self.__pass_turn(landing)
+        if not self.has_legal_move(self.current_player, self.current_color):  # skip move
+            self.__pass_turn(self.stones[self.current_player][self.current_color])
+            if not self.has_legal_move(self.current_player, self.current_color):  # deadlock
+                record.was_deadlock = True
+                self.__pass_turn(self.stones[self.current_player][self.current_color])
+                self.__process_round_winner(self.current_player, self.current_color, record)
+                self.__invalidate_features(changed, record.stale, all_stones=True)
+        return record
+
+    def undo_move(self, record):
+        old_player, old_color, start = record.old_player, record.old_color, record.start
+        self.turn_count -= 1
+        self.current_color = old_color
+        self.current_player = old_player
+        self.winner = None
+        self.round_over = False
+        if record.promoted_player is not None:
+            self.sumo_levels[record.promoted_player][record.promoted_color] -= 1
+        self.__move_stone(old_player, old_color, start)
+        ray = RAYS[old_player][start][STRAIGHT]
+        for index in range(record.pushed):
+            self.__move_stone(1 - old_player, self.cells[ray[index + 1]], ray[index])
+        self.hash = record.old_hash
+        self.mirror_hash = record.old_mirror_hash
+        for player, color, features in reversed(record.stale):
+            self.features[player][color] = features
@@ -0,0 +1,192 @@
+import argparse
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from engine import Engine
+from transposition import EXACT, LOWER, UPPER
+
+MAGIC = b'KMDC'
+VERSION = 1
+HEADER = struct.Struct('<4sIQ')  # magic, version, slot count
+HEADER_BYTES = 64
+SLOT = struct.Struct('<QQ')  # key ^ data, data
+NO_MOVE = 0xff
+USED = 1 << 56
+SCORE_SCALE = round(1 / Engine.SCORE_STEP)  # scores are stored as whole steps of Engine.SCORE_STEP
+BOUND_NAMES = {EXACT: 'exact', LOWER: 'lower', UPPER: 'upper'}
+
+
+def lock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def pack(depth, bound, score, move):
+    scaled = int(score * SCORE_SCALE)
+    return USED | (scaled & 0xffffffff) | depth << 32 | bound << 40 | (NO_MOVE if move is None else move) << 48
+
+
+def unpack(data):
+    scaled = data & 0xffffffff
+    if scaled >= 1 << 31:
+        scaled -= 1 << 32
+    move = data >> 48 & 0xff
+    return data >> 32 & 0xff, data >> 40 & 0xff, scaled / SCORE_SCALE, None if move == NO_MOVE else move
+
+
+class DiskCache:
+    """Fixed-size hash table of search results in a memory-mapped file.
+
+    Entries hold the same (depth, bound, score, move) as TranspositionTable and are keyed by
+    the BitBoard table key, whose zobrist keys are the same in every process. The file is
+    mapped shared, so any number of engine processes can read and write it at once and the
+    results stay for the next run.
+
+    A slot stores key ^ data next to data, and a probe only accepts it if both words fit
+    the key. A slot torn by two processes writing it at the same time reads as a miss
+    instead of as a wrong entry, so there is no locking.
+
+    Replacement rule: an empty slot is always filled. A filled slot is only overwritten by a
+    result searched at least as deep, or by any result for the same position. A slot whose
+    key does not belong to its index is torn and overwritten as well. Deeper results of
+    other positions stay until compact drops them. A read-only cache ignores stores.
+    """
+
+    def __init__(self, path, megabytes=64, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self.fd = os.open(path, os.O_RDONLY if readonly else os.O_RDWR | os.O_CREAT, 0o644)
+        if not readonly:
+            # the first process to get the lock creates the file, the others find it complete
+            lock(self.fd)
+            if os.fstat(self.fd).st_size == 0:
+                slots = 1
+                while HEADER_BYTES + slots * 2 * SLOT.size <= megabytes * 2 ** 20:
+                    slots *= 2
+                os.ftruncate(self.fd, HEADER_BYTES + slots * SLOT.size)
+                os.pwrite(self.fd, HEADER.pack(MAGIC, VERSION, slots), 0)
+            unlock(self.fd)
+        access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+        self.map = mmap.mmap(self.fd, 0, access=access)
+        magic, version, self.size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or len(self.map) != HEADER_BYTES + self.size * SLOT.size:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} engine cache')
+        self.mask = self.size - 1
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def close(self):
+        if not self.map.closed:
+            if not self.readonly:
+                self.map.flush()
+            self.map.close()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def probe(self, key):
+        check, data = SLOT.unpack_from(self.map, HEADER_BYTES + (key & self.mask) * SLOT.size)
+        if data and check ^ data == key:
+            self.hits += 1
+            return unpack(data)
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        if self.readonly:
+            return
+        index = key & self.mask
+        offset = HEADER_BYTES + index * SLOT.size
+        check, data = SLOT.unpack_from(self.map, offset)
+        stored_key = check ^ data
+        if data and stored_key != key and stored_key & self.mask == index and data >> 32 & 0xff > depth:
+            return
+        data = pack(depth, bound, score, move)
+        SLOT.pack_into(self.map, offset, key ^ data, data)
+        self.stores += 1
+
+    def entries(self):
+        """Generates (key, depth, bound, score, move) of every filled slot that is not torn."""
+        for index, (check, data) in enumerate(SLOT.iter_unpack(self.map[HEADER_BYTES:])):
+            if data and (check ^ data) & self.mask == index:
+                yield (check ^ data, *unpack(data))
+
+    def debug_lines(self):
+        probes = self.hits + self.misses
+        return [f'disk cache: {self.hits} hits, {self.hits / probes if probes else 0:.0%} hit rate']
+
+
+def inspect(path):
+    with DiskCache(path, readonly=True) as cache:
+        depths = {}
+        bounds = {bound: 0 for bound in BOUND_NAMES}
+        used = 0
+        for key, depth, bound, score, move in cache.entries():
+            used += 1
+            depths[depth] = depths.get(depth, 0) + 1
+            bounds[bound] += 1
+        print(f'{path}: {cache.size} slots, {used} used ({used / cache.size:.1%}), '
+              f'{os.path.getsize(path) / 2 ** 20:.1f} MB')
+        print('bounds: ' + ', '.join(f'{BOUND_NAMES[bound]} {count}' for bound, count in bounds.items()))
+        for depth in sorted(depths):
+            print(f'depth {depth:>3}: {depths[depth]}')
+
+
+def compact(path, output, megabytes, min_depth):
+    """Copies the entries searched to at least min_depth into a new cache of megabytes,
+    deepest first so that they win the slots, and replaces path by it if output is None."""
+    with DiskCache(path, readonly=True) as cache:
+        entries = sorted((entry for entry in cache.entries() if entry[1] >= min_depth), key=lambda entry: -entry[1])
+    target = output or path + '.compact'
+    if os.path.exists(target):
+        os.remove(target)
+    with DiskCache(target, megabytes) as compacted:
+        for entry in entries:
+            compacted.store(*entry)
+        kept = sum(1 for _ in compacted.entries())
+    if output is None:
+        os.replace(target, path)
+    print(f'kept {kept} of {len(entries)} entries with depth >= {min_depth} in {output or path}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or compact an engine disk cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+    inspect_parser = commands.add_parser('inspect', help='slot usage, bounds and depths')
+    inspect_parser.add_argument('path')
+    compact_parser = commands.add_parser('compact', help='drop shallow entries and resize')
+    compact_parser.add_argument('path')
+    compact_parser.add_argument('--output', help='write to a new file instead of replacing path')
+    compact_parser.add_argument('--megabytes', type=int, default=64)
+    compact_parser.add_argument('--min-depth', type=int, default=0)
+    args = parser.parse_args()
+    if args.command == 'inspect':
+        inspect(args.path)
+    elif args.command == 'compact':
+        compact(args.path, args.output, args.megabytes, args.min_depth)
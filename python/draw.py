@@ -1,3 +1,4 @@
+from functools import lru_cache
 from itertools import product
 import math
 from PIL import Image, ImageDraw
@@ -46,7 +47,8 @@ COLORS = [
 ]
 
 
-def draw_board(board):
+def draw_board_uncached(board):
+    """Draws every cell, stone and spike of board from scratch, the reference for draw_board."""
     def bounding_box(offset, bounding):
         coords = (pos[1] * CELL_PIXELS, pos[0] * CELL_PIXELS)
         return [tuple(v + offset + bounding for v in coords),
@@ -86,6 +88,76 @@ def draw_board(board):
     return img
 
 
+@lru_cache(maxsize=None)
+def stone_sprite(player_name, color, sumo_level):
+    """Transparent cell sized image of a stone with its shadow, color ring and sumo spikes."""
+    img = Image.new('RGBA', (CELL_PIXELS, ) * 2, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    pcolors = player_colors[player_name]
+    draw.ellipse(_cell_box(0, PIECE_BOUNDING), fill=pcolors['shadow'])
+    draw.ellipse(_cell_box(-SHADOW_PIXELS, PIECE_BOUNDING), fill=pcolors['stone'])
+    draw.ellipse(_cell_box(-SHADOW_PIXELS, COLOR_BOUNDING), fill=COLORS[color])
+    circle_radius = (CELL_PIXELS - PIECE_BOUNDING - COLOR_BOUNDING) / 2
+    cell_center = _cell_box(CELL_PIXELS / 2 - SHADOW_PIXELS, 0)[0]
+    max_spike_offset = (sumo_level - 1) * math.radians(SPIKE_OFFSET) / 2
+    for base_rotation in linspace(0, 2 * math.pi, SPIKE_GROUPS, endpoint=False):
+        for spike_offset in linspace(-max_spike_offset, max_spike_offset, sumo_level):
+            rotation = base_rotation + spike_offset
+            triangle_coords = (cell_center[0] - math.sin(rotation) * circle_radius,
+                               cell_center[1] - math.cos(rotation) * circle_radius)
+            draw.regular_polygon([triangle_coords, SPIKE_SIZE], 3, rotation=math.degrees(rotation),
+                                 fill=pcolors['complement'])
+    return img
+
+
+def _cell_box(offset, bounding):
+    return [(offset + bounding, ) * 2, (offset - bounding + CELL_PIXELS, ) * 2]
+
+
+@lru_cache(maxsize=None)
+def marker_sprite(player_name):
+    """Transparent cell sized ring marking a legal move of the player to move."""
+    img = Image.new('RGBA', (CELL_PIXELS, ) * 2, (0, 0, 0, 0))
+    ImageDraw.Draw(img).ellipse(_cell_box(0, PIECE_BOUNDING), outline=player_colors[player_name]['stone'], width=5)
+    return img
+
+
+def cell_keys(board):
+    """What each of the 64 cells shows, row by row: (board color, stone, marker) with the stone
+    as (player name, color, sumo level) and the marker as the name of the player to move."""
+    stones = {}
+    for player in (board.fst_player, board.snd_player):
+        for color, pos in enumerate(player.stones):
+            stones[pos] = player.name, color, player.sumo_levels[color]
+    marker = board.current_player.name
+    markers = set(board.get_legal_moves())
+    return [(game.Board.get_board_color(pos), stones.get(pos), marker if pos in markers else None)
+            for pos in product(range(8), repeat=2)]
+
+
+@lru_cache(maxsize=None)
+def cell_image(key):
+    """RGB image of one cell as described by a key from cell_keys, composed from the sprites."""
+    board_color, stone, marker = key
+    img = Image.new('RGB', (CELL_PIXELS, ) * 2, COLORS[board_color])
+    if stone is not None:
+        sprite = stone_sprite(*stone)
+        img.paste(sprite, (0, 0), sprite)
+    if marker is not None:
+        sprite = marker_sprite(marker)
+        img.paste(sprite, (0, 0), sprite)
+    return img
+
+
+def draw_board(board):
+    """The image of draw_board_uncached, pasted together from cached cell images."""
+    img = Image.new('RGB', (BOARD_PIXELS, ) * 2)
+    for index, key in enumerate(cell_keys(board)):
+        row, col = divmod(index, 8)
+        img.paste(cell_image(key), (col * CELL_PIXELS, row * CELL_PIXELS))
+    return img
+
+
 if __name__ == '__main__':
     my_board = game.Board()
     my_board.set_color(0)
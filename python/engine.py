@@ -1,149 +1,239 @@
+import sys
 import game
 import time
 from copy import deepcopy
-from itertools import product
-
-
-def __make_occupy_consistent(board):
-    for row, col in product(range(game.BLEN), repeat=2):
-        occupied = any((row, col) in player.stones for player in (board.fst_player, board.snd_player))
-        board.occupied[row][col] = occupied
-
-
-def do_move(board: game.Board, target_pos: (int, int)):
-    was_sumo_move = False
-    sumo_pos = ((0, 0), (0, 0))
-    old_color = board.current_color
-    old_player = board.current_player
-    someone_won = False
-    winner_info = None
-    was_deadlock = False
-
-
-    def set_current_color_and_player():
-        board.current_color = game.Board.get_board_color(target_pos)
-        board.current_player = board._Board__other_player()
-
-    if board.current_color is None:
-        raise game.GameException('Must set a color first')
-    if not board.is_in_bounds(target_pos):
-        raise game.GameException('Cannot move stone out of bounds')
-    sumo_level = board.current_player.sumo_levels[board.current_color]
-    stone_pos = board.current_player.stones[board.current_color]
-
-    try:
-        board._Board__check_path(stone_pos, target_pos)
-    except game.GameException as e:
-        is_one_step_move = target_pos[0] - stone_pos[0] == board._Board__direction()
-        if sumo_level > 0 and is_one_step_move and stone_pos[1] == target_pos[1]:
-            target_pos = board._Board__check_sumo(target_pos)
-            was_sumo_move = True
-            sumo_pos = (stone_pos, target_pos)
-            board._Board__sumo_cascade(stone_pos, target_pos)
-        else:
-            raise e
-    else:
-        if abs(target_pos[0] - stone_pos[0]) > game.Board.SUMO_STATS['range'][sumo_level]:
-            raise game.GameException('Move exceeds max range')
-        board._Board__move_stone(board.current_player, board.current_color, target_pos)
-        if target_pos[0] == board._Board__other_player().start_row:
-            someone_won = True
-            winner_info = (board.current_player, board.current_color)
-            board._Board__process_round_winner(board.current_player)
-            board.turn_count += 1
-            return [old_color, old_player, stone_pos, was_sumo_move, sumo_pos, someone_won, winner_info, was_deadlock]
-    board.turn_count += 1  # player 0 made this move
-    set_current_color_and_player()  # now current player is 1
-    if not board.get_legal_moves():  # then skip move
-        target_pos = board.current_player.stones[board.current_color]
-        set_current_color_and_player()  # now current player is 0
-        if not board.get_legal_moves():  # deadlock, causing player 0 loses, player 1 wins
-            was_deadlock = True
-            target_pos = board.current_player.stones[board.current_color]
-            set_current_color_and_player()
-            someone_won = True
-            winner_info = (board.current_player, board.current_color)
-            board._Board__process_round_winner(board.current_player)
-    return [old_color, old_player, stone_pos, was_sumo_move, sumo_pos, someone_won, winner_info, was_deadlock]
-
-def undo_move(board: game.Board, move_info):
-    board.turn_count -= 1
-    board.current_color = move_info[0]
-    board.current_player = move_info[1]
-    board.winner = None
-    board.round_over = False
-
-    if move_info[5]:  # someone won
-        winner_info = move_info[6]
-        winner_info[0].sumo_levels[winner_info[1]] -= 1
-
-    if move_info[3]: # was_sumo_move
-        sumo_pos = move_info[4]
-        board._Board__sumo_cascade(sumo_pos[1], sumo_pos[0])
-    else:
-        board._Board__move_stone(board.current_player, board.current_color, move_info[2])
+from bitboard import BitBoard, mirror_square, to_pos
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from search_stats import SearchStats
+
+
+class SearchAborted(Exception):
+    pass
 
 
 class Engine:
 
     INF = 9999
     END_SCORE = 1000
-    current_best_move = (10, 10)
+    # evaluations are multiples of 1/8, so no score lies strictly between alpha and alpha + SCORE_STEP
+    SCORE_STEP = 1 / 8
+    aspiration_window = 1
+    aspiration_widenings = 2
+    # shallower nodes are not worth a disk cache probe
+    disk_cache_depth = 3
+    current_best_move = None
     max_depth = 100
     current_depth = 1
     positions_evaluated = 0
+    nodes = 0
     start_time = 0
+    deadline = None
+    node_limit = None
+    check_interval = 256
+    root_moves = None
+    next_check = check_interval
+    stop_requested = False
+    # milliseconds from the start of a pondering think, set by ponder_hit
+    ponder_time = None
+
+    def __init__(self, table_megabytes=16, symmetric_table=True, stats=None, move_ordering=True, pvs=True,
+                 aspiration=True, batch_leaves=False, disk_cache=None, book=None, use_book=True):
+        self.table = TranspositionTable(table_megabytes)
+        # an opening_book.OpeningBook answering its positions without a search
+        self.book = book
+        self.use_book = use_book
+        # a disk_cache.DiskCache shared with other engines and later runs
+        self.disk_cache = disk_cache
+        self.symmetric_table = symmetric_table
+        self.stats = stats
+        # score all children of the last ply with one batch_eval call instead of one by one
+        self.batch_leaves = batch_leaves
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.researches = 0
+        # killer moves, history and principal variation, the table move is always tried first
+        self.move_ordering = move_ordering
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        # indexed by (color * 64 + from square) * 64 + to square
+        self.history = [0] * (8 * 64 * 64)
+        self.pv_table = [()] * (self.max_depth + 1)
+        self.pv_line = ()
+        self.follow_pv = False
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def get_move(self, current_board: game.Board, time_to_calc=None, node_limit=None, depth=None, ponder=False):
+        """Iteratively deepens until time_to_calc milliseconds, node_limit searched nodes
+        or the fixed depth are used up, whichever comes first.
+
+        An iteration running out of time or nodes is aborted, the move of the last completed
+        depth is played. Node and depth limits give reproducible results on any machine.
+        """
+        self.check_searchable(current_board)
+        bitboard = BitBoard.from_board(current_board)
+        if self.book is not None and self.use_book:
+            entry = self.book.lookup(bitboard)
+            if entry is not None:
+                book_move, book_depth, book_score = entry
+                self.nodes = self.positions_evaluated = 0
+                self.pv_line = (book_move,)
+                return to_pos(book_move), self.describe(book_score, 0, book_depth) + ['book move']
+        iterations = self.think(bitboard, time_to_calc, node_limit, depth, ponder=ponder)
+        completed_depth, eval_score, best_move = iterations[-1]
+
+        best_move = to_pos(best_move)
+        board_copy = deepcopy(current_board)
+        board_copy.perform_move(best_move)
+        debug = (self.describe(eval_score, self.positions_evaluated, completed_depth)
+                 + [f'{self.first_move_cutoff_rate():.0%} first-move cutoffs', f'{self.researches} re-searches']
+                 + self.table.debug_lines())
+        if self.disk_cache is not None:
+            debug += self.disk_cache.debug_lines()
+        return best_move, debug
 
     @staticmethod
-    def has_winning_move(board: game.Board, player, color=None):
-        previous_player = board.current_player
-        board.current_player = player
-        winning_row = board._Board__other_player().start_row
-        has_winning_move = any(map(lambda x: x[0] == winning_row, board.get_legal_moves(color)))
-        board.current_player = previous_player
-        return has_winning_move
-
-    @staticmethod
-    def winning_stone_count(board: game.Board, player: game.Player):
-        return len(list(filter(lambda x: Engine.has_winning_move(board, player, color=x), range(8))))
-
-    @staticmethod
-    def available_colors_count(board: game.Board, player: game.Player, color):
-        previous_player = board.current_player
-        board.current_player = player
-        total_available = set({})
-        for move_pos in board.get_legal_moves(color):
-            total_available.add(game.Board.get_board_color(move_pos))
-
-        board.current_player = previous_player
-        return len(total_available)
-
-    @staticmethod
-    def avg_color_diversity(board, player):
-        return sum(Engine.available_colors_count(board, player, color) for color in range(8)) / 8
-
-    def get_move(self, current_board: game.Board, time_to_calc):
+    def check_searchable(board: game.Board):
+        if board.current_color is None:
+            raise game.GameException('Must set a color first')
+        if board.round_over:
+            raise game.GameException('Round is over, there is no move to search')
+
+    def think(self, board: BitBoard, time_to_calc=None, node_limit=None, depth=None, root_moves=None, ponder=False):
+        """Runs the iterative deepening of get_move on board, only trying root_moves at the root
+        if given. Returns (depth, score, best move) of every completed iteration.
+
+        A ponder search needs no limit, it runs until stop or ponder_hit is called from another thread.
+        """
+        if time_to_calc is None and node_limit is None and depth is None and not ponder:
+            raise ValueError('get_move needs a time, node or depth limit')
+        if depth is not None and depth < 1:
+            raise ValueError('get_move needs a depth of at least 1')
         self.start_time = time.time() * 1000
-        while time.time() * 1000 - self.start_time < time_to_calc - 50:
-            if self.current_depth >= self.max_depth:
-                break
-            eval_score = self.search(current_board, self.current_depth, 0, -self.INF, self.INF)
-            self.current_depth += 1
+        self.deadline = None if time_to_calc is None else self.start_time + time_to_calc - 50
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.next_check = self.check_interval if node_limit is None else min(self.check_interval, node_limit)
+        self.positions_evaluated = 0
+        self.root_moves = root_moves
+        self.current_best_move = None
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.researches = 0
+        self.killers = [[None, None] for _ in range(self.max_depth + 1)]
+        self.history = [value >> 1 for value in self.history]
+        self.pv_line = ()
+        if self.stats is not None:
+            self.stats.start_search()
+        last_depth = self.max_depth if depth is None else min(depth + 1, self.max_depth)
+        self.table.new_search()
+        iterations = []
+        self.current_depth = 1
+        eval_score = None
+        try:
+            while self.current_depth < last_depth and (self.current_depth == 1 or not self.limits_reached()):
+                iteration_start = time.perf_counter()
+                try:
+                    eval_score = self.search_root(board, eval_score)
+                except SearchAborted:
+                    if self.stats is not None:
+                        self.stats.finish_iteration(self.current_depth, time.perf_counter() - iteration_start,
+                                                    None, None, aborted=True)
+                    break
+                iterations.append((self.current_depth, eval_score, self.current_best_move))
+                self.pv_line = self.pv_table[0]
+                if self.stats is not None:
+                    self.stats.finish_iteration(self.current_depth, time.perf_counter() - iteration_start,
+                                                eval_score, to_pos(self.current_best_move))
+                self.current_depth += 1
+        finally:
+            # cleared at the end, a stop arriving before the search got going still counts
+            self.reset_limits()
+        return iterations
+
+    def search_root(self, board: BitBoard, previous_score):
+        """Searches the current depth in a narrow window around the score of the previous
+        iteration. A score outside of it widens the failing side, at last to the full window."""
+        alpha, beta = -self.INF, self.INF
+        if self.aspiration and previous_score is not None and not self.sees_win(previous_score) \
+                and abs(previous_score) < self.INF:
+            alpha, beta = previous_score - self.aspiration_window, previous_score + self.aspiration_window
+        window = self.aspiration_window
+        widenings = 0
+        while True:
+            self.follow_pv = self.move_ordering
+            eval_score = self.search(board, self.current_depth, 0, alpha, beta)
+            if alpha < eval_score < beta or (eval_score <= alpha and alpha == -self.INF) \
+                    or (eval_score >= beta and beta == self.INF):
+                return eval_score
+            self.researches += 1
+            widenings += 1
+            window *= 4
+            if eval_score <= alpha:
+                alpha = previous_score - window if widenings < self.aspiration_widenings else -self.INF
+            else:
+                beta = previous_score + window if widenings < self.aspiration_widenings else self.INF
 
-        board_copy = deepcopy(current_board)
-        board_copy.perform_move(self.current_best_move)
+    def describe(self, eval_score, positions_evaluated, depth):
         if self.sees_win(eval_score):
             debug = ["Win in " + str(self.win_in(eval_score) - 1) + " half-moves for " + "me" if eval_score > 0 else "you"]
         else:
             debug = ["evaluation-score: " + str(-eval_score)]
-        debug += [str(self.positions_evaluated) + " evaluted positions",
-                     "to a depth of " + str(self.current_depth)]
-
-        return self.current_best_move, debug
-
-    def search(self, board: game.Board, depth, wurzel_abs, alpha, beta):
+        debug += [str(positions_evaluated) + " evaluted positions",
+                     "to a depth of " + str(depth)]
+        return debug
+
+    def stop(self):
+        """Makes a think running in another thread return the move of its last completed depth
+        right away. The first depth still completes."""
+        self.stop_requested = True
+
+    def ponder_hit(self, time_to_calc):
+        """Turns a running ponder search into one of time_to_calc milliseconds, counted from
+        the start of pondering. It returns right away if pondering already took longer."""
+        self.ponder_time = time_to_calc
+
+    def clear(self):
+        """Forgets the table and the move ordering history, the next think searches as a new engine would."""
+        self.table.clear()
+        self.history = [0] * len(self.history)
+
+    def reset_limits(self):
+        """Drops a stop or ponder_hit that no search has taken up yet."""
+        self.stop_requested = False
+        self.ponder_time = None
+
+    def limits_reached(self):
+        if self.stop_requested:
+            return True
+        if self.ponder_time is not None and time.time() * 1000 >= self.start_time + self.ponder_time - 50:
+            return True
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            return True
+        return self.deadline is not None and time.time() * 1000 >= self.deadline
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0
+
+    def check_limits(self):
+        self.next_check = self.nodes + self.check_interval
+        if self.node_limit is not None:
+            self.next_check = min(self.next_check, self.node_limit)
+        # the first iteration always completes so that there is a move to fall back to
+        if self.current_depth > 1 and self.limits_reached():
+            raise SearchAborted()
+
+    def search(self, board: BitBoard, depth, wurzel_abs, alpha, beta):
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        stats = self.stats
+        if stats is not None:
+            stats.node(wurzel_abs)
+        self.pv_table[wurzel_abs] = ()
         if depth == 0:
             self.positions_evaluated += 1
+            if stats is not None:
+                stats.evaluations += 1
             return self.score_position(board)
         if wurzel_abs > 0:
             alpha = max(alpha, -self.END_SCORE + wurzel_abs)
@@ -156,39 +246,163 @@ class Engine:
         if wurzel_abs > 0 and alpha >= beta:
             return alpha
 
-        current_piece_pos = board.current_player.stones[board.current_color]
-        possible_moves = board.get_legal_moves()
-        sorted_moves = reversed(sorted(possible_moves, key=lambda x: abs(x[0]-current_piece_pos[0])))
-        for move in sorted_moves:
-            print('         ' * (self.current_depth-depth) + str(depth) + ' - Evaluating move' + str(move))
-            move_info = do_move(board, move)
-            if (move_info[1] == board.current_player and not board.round_over) or move_info[7]:
-                evaluation = self.search(board, depth - 1, wurzel_abs + 1, alpha, beta)
+        table_move = None
+        table_key, mirrored = board.table_key() if self.symmetric_table else (board.hash, False)
+        entry = self.table.probe(table_key)
+        if entry is None and self.disk_cache is not None and depth >= self.disk_cache_depth:
+            entry = self.disk_cache.probe(table_key)
+        if entry is not None:
+            table_depth, bound, table_score, table_move = entry
+            if mirrored and table_move is not None:
+                table_move = mirror_square(table_move)
+            if wurzel_abs > 0 and table_depth >= depth:
+                table_score = self.score_from_table(table_score, wurzel_abs)
+                if bound == EXACT:
+                    return min(max(table_score, alpha), beta)
+                if bound == LOWER and table_score >= beta:
+                    return beta
+                if bound == UPPER and table_score <= alpha:
+                    return alpha
+
+        pv_move = None
+        if self.move_ordering:
+            # only the nodes along the previous iteration's principal variation try its move first
+            if self.follow_pv:
+                self.follow_pv = False
+                if wurzel_abs < len(self.pv_line):
+                    pv_move = self.pv_line[wurzel_abs]
+            killers = self.killers[wurzel_abs]
+            start = board.stones[board.current_player][board.current_color]
+            history = self.history
+            history_base = (board.current_color * 64 + start) * 64
+            # killers are stored as from square << 6 | to square, only those of this stone apply
+            killer_moves = tuple(killer & 63 for killer in killers if killer is not None and killer >> 6 == start)
+            moves = board.iter_moves((pv_move, table_move) + killer_moves, lambda move: -history[history_base + move])
+        else:
+            moves = board.iter_moves((table_move,))
+        if wurzel_abs == 0 and self.root_moves is not None:
+            moves = (move for move in moves if move in self.root_moves)
+        leaf_scores = None
+        if depth == 1 and self.batch_leaves:
+            moves = list(moves)
+            leaf_scores = self.score_children(board, moves, wurzel_abs + 1)
+        original_alpha = alpha
+        best_move = None
+        first_move = None
+        for index, move in enumerate(moves):
+            if index == 0:
+                first_move = move
+            if leaf_scores is not None:
+                evaluation = leaf_scores[index]
             else:
-                print(move_info[7])
-                evaluation = -self.search(board, depth - 1, wurzel_abs + 1, -beta, -alpha)
-
-            print(evaluation)
-
-            undo_move(board, move_info)
+                move_info = board.do_move(move)
+                self.follow_pv = move == pv_move
+                # not negated if the mover stays on turn because the opponent's turn is skipped, or
+                # if the move caused a deadlock, which loses the round for the mover
+                same_side = ((move_info.old_player == board.current_player and not board.round_over)
+                             or move_info.was_deadlock)
+                # after the first move, a null window only proves the move is no better than alpha,
+                # if it fails high the move is searched again with the full window
+                scout_beta = beta
+                if self.pvs and index > 0 and alpha + self.SCORE_STEP < beta:
+                    scout_beta = alpha + self.SCORE_STEP
+                # undone on SearchAborted as well, so that an aborted think leaves the board as it was
+                try:
+                    while True:
+                        if same_side:
+                            evaluation = self.search(board, depth - 1, wurzel_abs + 1, alpha, scout_beta)
+                        else:
+                            evaluation = -self.search(board, depth - 1, wurzel_abs + 1, -scout_beta, -alpha)
+                        if scout_beta == beta or evaluation <= alpha:
+                            break
+                        self.researches += 1
+                        scout_beta = beta
+                finally:
+                    board.undo_move(move_info)
 
             if evaluation >= beta:
+                self.cutoffs += 1
+                if index == 0:
+                    self.first_move_cutoffs += 1
+                if stats is not None:
+                    stats.cutoff(wurzel_abs, index)
+                if wurzel_abs == 0:
+                    # a move scoring INF reaches beta even in the full window
+                    self.current_best_move = move
+                    self.pv_table[0] = (move,) + self.pv_table[1]
+                if self.move_ordering:
+                    killer = start << 6 | move
+                    if killers[0] != killer:
+                        killers[0], killers[1] = killer, killers[0]
+                    history[history_base + move] += depth * depth
+                self.store(table_key, depth, LOWER, self.score_to_table(beta, wurzel_abs),
+                           mirror_square(move) if mirrored else move)
                 return beta
             if evaluation > alpha:
                 alpha = evaluation
+                best_move = move
+                self.pv_table[wurzel_abs] = (move,) + self.pv_table[wurzel_abs + 1]
 
                 if wurzel_abs == 0:
                     self.current_best_move = move
 
+        if wurzel_abs == 0:
+            if self.current_best_move is None:
+                # every move scored at or below -INF, any of them will do
+                self.current_best_move = first_move
+            if self.root_moves is not None:
+                # the score of a subset of root moves must not be mistaken for the position's
+                return alpha
+        bound = EXACT if alpha > original_alpha else UPPER
+        if best_move is None:
+            best_move = table_move
+        if mirrored and best_move is not None:
+            best_move = mirror_square(best_move)
+        self.store(table_key, depth, bound, self.score_to_table(alpha, wurzel_abs), best_move)
         return alpha
 
-    def score_position(self, board: game.Board):
-        if self.has_winning_move(board, board.current_player):
+    def store(self, table_key, depth, bound, score, move):
+        self.table.store(table_key, depth, bound, score, move)
+        if self.disk_cache is not None and depth >= self.disk_cache_depth:
+            self.disk_cache.store(table_key, depth, bound, score, move)
+
+    def score_children(self, board: BitBoard, moves, ply):
+        """Scores the positions after each of moves with one batch evaluation, from the view of
+        the side to move on board, as searching them to depth 0 one by one would."""
+        # NumPy is only needed with batch_leaves
+        import batch_eval
+        rows = []
+        signs = []
+        for move in moves:
+            move_info = board.do_move(move)
+            rows.append(batch_eval.encode(board))
+            same_side = (move_info.old_player == board.current_player and not board.round_over) or move_info.was_deadlock
+            signs.append(1 if same_side else -1)
+            board.undo_move(move_info)
+        self.pv_table[ply] = ()
+        self.nodes += len(rows)
+        self.positions_evaluated += len(rows)
+        if self.stats is not None:
+            for _ in rows:
+                self.stats.node(ply)
+            self.stats.evaluations += len(rows)
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        scores = batch_eval.evaluate(batch_eval.PositionBatch(rows)) if rows else []
+        return [sign * float(score) for sign, score in zip(signs, scores)]
+
+    def score_position(self, board: BitBoard):
+        if board.round_over or board.current_color is None:
+            return 0
+        player = board.current_player
+        own_threats = board.winning_threats(player)
+        if own_threats >> board.current_color & 1:
             return self.INF
 
-        winning_stone_diff = self.winning_stone_count(board, board.current_player) - self.winning_stone_count(board, board._Board__other_player())
-        color_div_diff = self.avg_color_diversity(board, board.current_player) - self.avg_color_diversity(board, board._Board__other_player())
-        return winning_stone_diff + color_div_diff
+        winning_stone_diff = bin(own_threats).count('1') - bin(board.winning_threats(1 - player)).count('1')
+        own_colors = sum(board.stone_features(player, color)[2] for color in range(8))
+        other_colors = sum(board.stone_features(1 - player, color)[2] for color in range(8))
+        return winning_stone_diff + own_colors / 8 - other_colors / 8
 
     def sees_win(self, evaluation):
         if self.END_SCORE - abs(evaluation) < self.max_depth:
@@ -199,14 +413,28 @@ class Engine:
     def win_in(self, evaluation):
         return self.END_SCORE - abs(evaluation)
 
+    def is_win_score(self, evaluation):
+        return self.END_SCORE - self.max_depth < abs(evaluation) <= self.END_SCORE
+
+    def score_to_table(self, evaluation, wurzel_abs):
+        # win scores count half-moves from the root, the table counts them from the stored node
+        if self.is_win_score(evaluation):
+            return evaluation + wurzel_abs if evaluation > 0 else evaluation - wurzel_abs
+        return evaluation
+
+    def score_from_table(self, evaluation, wurzel_abs):
+        if self.is_win_score(evaluation):
+            return evaluation - wurzel_abs if evaluation > 0 else evaluation + wurzel_abs
+        return evaluation
+
 
 if __name__ == '__main__':
     board = game.Board()
-    engine = Engine()
+    engine = Engine(stats=SearchStats(stream=sys.stdout))
 
     board.set_color(3)
     board.perform_move((3, 3))
     board.perform_move((4, 0))
     board.draw().show()
 
-    print(engine.get_move(board))
+    print(engine.get_move(board, 1000))
@@ -7,6 +7,8 @@ class GameException(Exception):
 
 BLEN = 8
 
+NORMAL_MOVE, WINNING_MOVE, SUMO_MOVE = range(3)
+
 
 class Player:
     def __init__(self, name, stones):
@@ -33,6 +35,19 @@ class Player:
             self.stones[color] = self.start_row, place
 
 
+class AppliedMove:
+    """What Board.revert_move needs to take back a move made with Board.apply_move."""
+    __slots__ = ('old_color', 'old_player', 'start_pos', 'target_pos', 'push_length', 'promoted')
+
+    def __init__(self, old_color, old_player, start_pos, target_pos, push_length):
+        self.old_color = old_color
+        self.old_player = old_player
+        self.start_pos = start_pos
+        self.target_pos = target_pos
+        self.push_length = push_length
+        self.promoted = None
+
+
 class Board:
     BOARD_COLORS = [
         [7, 6, 5, 4, 3, 2, 1, 0],
@@ -73,6 +88,34 @@ class Board:
         self.fst_player = Player('White', [(BLEN - 1, i) for i in range(BLEN)])
         self.snd_player = Player('Black', [(0, i) for i in reversed(range(BLEN))])
         self.current_player = self.fst_player
+        self.__index_stones()
+
+    def __index_stones(self):
+        self.stone_index = {}
+        # the stone lists indexed, replacing a list on a Player calls for a new index
+        self.indexed_stones = self.fst_player.stones, self.snd_player.stones
+        for player in (self.snd_player, self.fst_player):
+            for color in reversed(range(BLEN)):
+                self.stone_index[player.stones[color]] = player, color
+
+    def get_stone(self, pos):
+        """Returns (owner, color) of the stone on pos or None.
+
+        The index is kept up to date by moves. Positions set directly on Player.stones are
+        picked up by re-indexing when a stone list was replaced, a found stone has moved or
+        an occupied square has no stone in the index.
+        """
+        fst_stones, snd_stones = self.indexed_stones
+        if self.fst_player.stones is not fst_stones or self.snd_player.stones is not snd_stones:
+            self.__index_stones()
+        stone = self.stone_index.get(pos)
+        if stone is None:
+            if not self.occupied[pos[0]][pos[1]]:
+                return None
+        elif stone[0].stones[stone[1]] == pos:
+            return stone
+        self.__index_stones()
+        return self.stone_index.get(pos)
 
     def __other_player(self):
         return self.snd_player if self.current_player == self.fst_player else self.fst_player
@@ -97,7 +140,9 @@ class Board:
 
     def __move_stone(self, owner, color, target_pos):
         self.__unoccupy(owner.stones[color])
+        self.stone_index.pop(owner.stones[color], None)
         owner.stones[color] = target_pos
+        self.stone_index[target_pos] = owner, color
         self.__occupy(target_pos)
 
     def __check_path(self, start_pos, target_pos):
@@ -125,21 +170,36 @@ class Board:
         sumo_power = Board.SUMO_STATS['power'][sumo_level]
         push_pos = target_pos
         while self.__is_occupied(push_pos):
-            if push_pos in self.current_player.stones:
+            owner, push_color = self.get_stone(push_pos)
+            if owner == self.current_player:
                 raise GameException('Sumo cannot push own stone')
             if abs(push_pos[0] - target_pos[0]) >= sumo_power:
                 raise GameException('Sumo is pushing too many stones')
-            other = self.__other_player()
-            if other.sumo_levels[other.stones.index(push_pos)] >= sumo_level:
+            if owner.sumo_levels[push_color] >= sumo_level:
                 raise GameException('Sumo cannot push same strength sumo')
             push_pos = self.__next_pos(push_pos)
             if not self.is_in_bounds(push_pos):
                 raise GameException('Sumo cannot push off the board')
         return push_pos
 
+    def __push_length(self, target_pos, color):
+        """Number of stones pushed by a sumo moving onto target_pos, 0 if the push is illegal."""
+        sumo_level = self.current_player.sumo_levels[color]
+        push_pos = target_pos
+        pushed = 0
+        while self.__is_occupied(push_pos):
+            owner, push_color = self.get_stone(push_pos)
+            if owner == self.current_player or pushed >= sumo_level or owner.sumo_levels[push_color] >= sumo_level:
+                return 0
+            push_pos = self.__next_pos(push_pos)
+            pushed += 1
+            if not self.is_in_bounds(push_pos):
+                return 0
+        return pushed
+
     def __sumo_cascade(self, sumo_pos, end_pos):
         def move_sumo(player, pos):
-            self.__move_stone(player, player.stones.index(pos), self.__next_pos(pos))
+            self.__move_stone(player, self.get_stone(pos)[1], self.__next_pos(pos))
         assert not self.__is_occupied(end_pos)
         stone_pos = self.__previous_pos(end_pos)
         while stone_pos != sumo_pos:
@@ -152,6 +212,23 @@ class Board:
         winner.sumo_levels[self.current_color] += 1
         if winner.get_points() >= self.winning_points:
             self.winner = winner
+        return winner, self.current_color
+
+    def __pass_turn(self, target_pos):
+        """Hands the turn over after a move ending on target_pos, skipping the turn of a blocked
+        player. Returns the promoted (winner, color) if both players are blocked."""
+        def set_current_color_and_player():
+            self.current_color = Board.get_board_color(target_pos)
+            self.current_player = self.__other_player()
+        set_current_color_and_player()  # now current player is 1
+        if not self.has_legal_move():  # then skip move
+            target_pos = self.current_player.stones[self.current_color]
+            set_current_color_and_player()  # now current player is 0
+            if not self.has_legal_move():  # deadlock, causing player 0 loses, player 1 wins
+                target_pos = self.current_player.stones[self.current_color]
+                set_current_color_and_player()
+                return self.__process_round_winner(self.current_player)
+        return None
 
     def set_color(self, color):
         if self.turn_count > 0:
@@ -159,9 +236,6 @@ class Board:
         self.current_color = color
 
     def perform_move(self, target_pos):
-        def set_current_color_and_player():
-            self.current_color = Board.get_board_color(target_pos)
-            self.current_player = self.__other_player()
         if self.current_color is None:
             raise GameException('Must set a color first')
         if not self.is_in_bounds(target_pos):
@@ -186,16 +260,48 @@ class Board:
                 self.turn_count += 1
                 return
         self.turn_count += 1  # player 0 made this move
-        set_current_color_and_player()  # now current player is 1
-        if not self.get_legal_moves():  # then skip move
-            target_pos = self.current_player.stones[self.current_color]
-            set_current_color_and_player()  # now current player is 0
-            if not self.get_legal_moves():  # deadlock, causing player 0 loses, player 1 wins
-                target_pos = self.current_player.stones[self.current_color]
-                set_current_color_and_player()
-                self.__process_round_winner(self.current_player)
-
-    def get_legal_moves(self, color=None):
+        self.__pass_turn(target_pos)
+
+    def apply_move(self, move):
+        """Trusted counterpart of perform_move for a move from get_classified_moves.
+
+        Nothing is validated. Returns the AppliedMove that revert_move takes back.
+        """
+        target_pos, kind, push_length = move
+        record = AppliedMove(self.current_color, self.current_player,
+                             self.current_player.stones[self.current_color], target_pos, push_length)
+        if kind == SUMO_MOVE:
+            target_pos = target_pos[0] + push_length * self.__direction(), target_pos[1]
+            self.__sumo_cascade(record.start_pos, target_pos)
+        else:
+            self.__move_stone(self.current_player, self.current_color, target_pos)
+            if kind == WINNING_MOVE:
+                record.promoted = self.__process_round_winner(self.current_player)
+                self.turn_count += 1
+                return record
+        self.turn_count += 1
+        record.promoted = self.__pass_turn(target_pos)
+        return record
+
+    def revert_move(self, record):
+        self.turn_count -= 1
+        self.current_color = record.old_color
+        self.current_player = record.old_player
+        self.winner = None
+        self.round_over = False
+        if record.promoted is not None:
+            winner, color = record.promoted
+            winner.sumo_levels[color] -= 1
+        self.__move_stone(self.current_player, self.current_color, record.start_pos)
+        pos = record.target_pos
+        for _ in range(record.push_length):
+            pushed_pos = self.__next_pos(pos)
+            self.__move_stone(self.__other_player(), self.get_stone(pushed_pos)[1], pos)
+            pos = pushed_pos
+
+    def get_classified_moves(self, color=None):
+        """Legal moves as (target_pos, kind, push_length) tuples for apply_move, in the order
+        of get_legal_moves. kind is NORMAL_MOVE, WINNING_MOVE or SUMO_MOVE."""
         if color is None:
             color = self.current_color
         if self.round_over or self.current_color is None:
@@ -203,6 +309,7 @@ class Board:
         sumo_level = self.current_player.sumo_levels[color]
         max_range = Board.SUMO_STATS['range'][sumo_level]
         start_pos = self.current_player.stones[color]
+        winning_row = self.__other_player().start_row
         legal_moves = []
         for diag_direction in (-1, 0, 1):
             for step in range(1, max_range + 1):
@@ -211,18 +318,38 @@ class Board:
                 if not Board.is_in_bounds(pos):
                     break
                 if self.__is_occupied(pos):
-                    sumo_level = self.current_player.sumo_levels[color]
                     if sumo_level > 0 and step == 1 and diag_direction == 0:
-                        try:
-                            self.__check_sumo(pos, color)
-                        except GameException:
-                            pass
-                        else:
-                            legal_moves.append(pos)
+                        push_length = self.__push_length(pos, color)
+                        if push_length:
+                            legal_moves.append((pos, SUMO_MOVE, push_length))
                     break
-                legal_moves.append(pos)
+                legal_moves.append((pos, WINNING_MOVE if pos[0] == winning_row else NORMAL_MOVE, 0))
         return legal_moves
 
+    def get_legal_moves(self, color=None):
+        return [move[0] for move in self.get_classified_moves(color)]
+
+    def has_legal_move(self, color=None):
+        """Whether get_legal_moves is not empty. A stone can only move at all if one of the
+        three squares ahead is free or it can push the stone straight ahead."""
+        if color is None:
+            color = self.current_color
+        if self.round_over or self.current_color is None:
+            return False
+        sumo_level = self.current_player.sumo_levels[color]
+        if Board.SUMO_STATS['range'][sumo_level] == 0:
+            return False
+        start_pos = self.current_player.stones[color]
+        for diag_direction in (-1, 0, 1):
+            pos = start_pos[0] + self.__direction(), start_pos[1] + diag_direction
+            if not Board.is_in_bounds(pos):
+                continue
+            if not self.__is_occupied(pos):
+                return True
+            if sumo_level > 0 and diag_direction == 0 and self.__push_length(pos, color):
+                return True
+        return False
+
     def reset(self, from_right):
         if not self.round_over:
             raise GameException('Round must be over to reset board')
@@ -234,6 +361,7 @@ class Board:
         self.current_color = None
         self.occupied = Board.get_start_board()
         self.round_over = False
+        self.__index_stones()
 
     def draw(self):
         return draw.draw_board(self)
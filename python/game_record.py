@@ -0,0 +1,249 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+
+import game
+
+MAGIC = b'KMGR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sI')  # magic, version
+# event byte count, game number, winning points, winner, metadata byte count
+GAME_HEADER = struct.Struct('<IIBBH')
+# one byte per event: a move's target square, the first color of a round or the fill side of a reset
+COLOR_EVENT = 64
+RESET_EVENT = COLOR_EVENT + game.BLEN
+NO_WINNER = 0xff
+FST_WINNER, SND_WINNER = 0, 1
+
+
+class GameRecord:
+    """One match: its header fields, free JSON metadata and the event bytes."""
+
+    def __init__(self, number, winning_points, winner, metadata, events):
+        self.number = number
+        self.winning_points = winning_points
+        self.winner = winner
+        self.metadata = metadata
+        self.events = events
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and (
+            (self.number, self.winning_points, self.winner, self.metadata, bytes(self.events))
+            == (other.number, other.winning_points, other.winner, other.metadata, bytes(other.events)))
+
+    def moves(self):
+        return sum(1 for event in self.events if event < COLOR_EVENT)
+
+
+class RecordingBoard:
+    """Wraps a game.Board and records every set_color, perform_move and reset made on it."""
+
+    def __init__(self, board=None):
+        self.board = game.Board() if board is None else board
+        self.events = bytearray()
+
+    def set_color(self, color):
+        self.board.set_color(color)
+        self.events.append(COLOR_EVENT + color)
+
+    def perform_move(self, target_pos):
+        self.board.perform_move(target_pos)
+        self.events.append(target_pos[0] * game.BLEN + target_pos[1])
+
+    def reset(self, from_right):
+        self.board.reset(from_right)
+        self.events.append(RESET_EVENT + bool(from_right))
+
+    def record(self, number=0, metadata=None):
+        board = self.board
+        if board.winner is None:
+            winner = NO_WINNER
+        else:
+            winner = FST_WINNER if board.winner == board.fst_player else SND_WINNER
+        return GameRecord(number, board.winning_points, winner, metadata or {}, bytes(self.events))
+
+
+def apply_event(board: game.Board, event):
+    if event < COLOR_EVENT:
+        board.perform_move(divmod(event, game.BLEN))
+    elif event < RESET_EVENT:
+        board.set_color(event - COLOR_EVENT)
+    else:
+        board.reset(from_right=event == RESET_EVENT + 1)
+
+
+def replay(record: GameRecord):
+    """Generates the board after every event of record, the same game.Board each time."""
+    board = game.Board(record.winning_points)
+    for event in record.events:
+        apply_event(board, event)
+        yield board
+
+
+def final_board(record: GameRecord):
+    board = None
+    for board in replay(record):
+        pass
+    return game.Board(record.winning_points) if board is None else board
+
+
+class RecordWriter:
+    """Appends game records to a file, creating it with the file header if needed."""
+
+    def __init__(self, path):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write(self, record: GameRecord):
+        metadata = json.dumps(record.metadata, separators=(',', ':')).encode() if record.metadata else b''
+        self.file.write(GAME_HEADER.pack(len(record.events), record.number, record.winning_points,
+                                         record.winner, len(metadata)))
+        self.file.write(metadata)
+        self.file.write(record.events)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordReader:
+    """Iterates the games of a record file through a read-only memory map, so that a file of
+    millions of games is paged in as it is read instead of loaded at once."""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+        if len(self.map) < FILE_HEADER.size or FILE_HEADER.unpack_from(self.map) != (MAGIC, VERSION):
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} game record file')
+
+    def __iter__(self):
+        offset = FILE_HEADER.size
+        size = len(self.map)
+        while offset < size:
+            if offset + GAME_HEADER.size > size:
+                raise ValueError(f'game header at byte {offset} is cut off')
+            event_count, number, winning_points, winner, metadata_size = GAME_HEADER.unpack_from(self.map, offset)
+            offset += GAME_HEADER.size
+            if offset + metadata_size + event_count > size:
+                raise ValueError(f'record of game {number} is cut off')
+            metadata = json.loads(self.map[offset:offset + metadata_size]) if metadata_size else {}
+            offset += metadata_size
+            yield GameRecord(number, winning_points, winner, metadata, self.map[offset:offset + event_count])
+            offset += event_count
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def from_match(match):
+    """GameRecord of a match written by tournament.py."""
+    events = bytearray()
+    for record in match['rounds']:
+        events.append(COLOR_EVENT + record['color'])
+        events.extend(row * game.BLEN + col for row, col in record['moves'])
+        if 'from_right' in record:
+            events.append(RESET_EVENT + record['from_right'])
+    winner = FST_WINNER if match['winner'] == match['white'] else SND_WINNER
+    return GameRecord(match['game'], match.get('winning_points', 3), winner, {'white': match['white']}, bytes(events))
+
+
+def to_match(record: GameRecord):
+    """The rounds of record in the layout of tournament.py, for tools reading that."""
+    rounds = []
+    for event in record.events:
+        if COLOR_EVENT <= event < RESET_EVENT:
+            rounds.append({'color': event - COLOR_EVENT, 'moves': []})
+        elif event < COLOR_EVENT:
+            rounds[-1]['moves'].append(divmod(event, game.BLEN))
+        else:
+            rounds[-1]['from_right'] = event == RESET_EVENT + 1
+    return {'game': record.number, 'winning_points': record.winning_points, 'rounds': rounds}
+
+
+def read_matches(path):
+    """Matches in the layout of tournament.py, from its JSON lines or from a game record file."""
+    with open(path, 'rb') as file:
+        binary = file.read(len(MAGIC)) == MAGIC
+    if binary:
+        with RecordReader(path) as reader:
+            for record in reader:
+                yield to_match(record)
+        return
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def to_text(record: GameRecord):
+    """Readable lines of record, one per event."""
+    winner = {FST_WINNER: 'White', SND_WINNER: 'Black', NO_WINNER: 'none'}[record.winner]
+    lines = [f'game {record.number}, {record.winning_points} points to win, winner {winner}'
+             + (f' {json.dumps(record.metadata)}' if record.metadata else '')]
+    for event in record.events:
+        if event < COLOR_EVENT:
+            lines.append(f'move {divmod(event, game.BLEN)}')
+        elif event < RESET_EVENT:
+            lines.append(f'color {event - COLOR_EVENT}')
+        else:
+            lines.append('reset from ' + ('right' if event == RESET_EVENT + 1 else 'left'))
+    return '\n'.join(lines)
+
+
+def stats(path):
+    """Games, bytes per move and replay speed of a record file."""
+    games = moves = 0
+    start = time.perf_counter()
+    with RecordReader(path) as reader:
+        for record in reader:
+            games += 1
+            moves += record.moves()
+            final_board(record)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f'{path}: {games} games, {moves} moves, {size} bytes, {size / moves if moves else 0:.2f} bytes per move')
+    print(f'replayed in {elapsed:.2f}s, {games / elapsed if elapsed else 0:.0f} games/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert, show and check binary game records')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_parser = commands.add_parser('convert', help='append the matches of tournament.py JSON lines')
+    convert_parser.add_argument('games')
+    convert_parser.add_argument('output')
+    text_parser = commands.add_parser('text', help='print records as readable text')
+    text_parser.add_argument('path')
+    text_parser.add_argument('--game', type=int, nargs='+', help='game numbers to print, all by default')
+    stats_parser = commands.add_parser('stats', help='size per move and replay speed')
+    stats_parser.add_argument('path')
+    args = parser.parse_args()
+    if args.command == 'convert':
+        with open(args.games) as games_file, RecordWriter(args.output) as writer:
+            for line in games_file:
+                if line.strip():
+                    writer.write(from_match(json.loads(line)))
+    elif args.command == 'text':
+        with RecordReader(args.path) as record_reader:
+            for game_record in record_reader:
+                if args.game is None or game_record.number in args.game:
+                    print(to_text(game_record) + '\n')
+    elif args.command == 'stats':
+        stats(args.path)
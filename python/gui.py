@@ -1,9 +1,15 @@
+from copy import deepcopy
 from itertools import product
+import threading
 
 import pygame
 import game
+from bitboard import BitBoard, to_pos
+import draw
 from draw import BOARD_PIXELS, CELL_PIXELS
 import engine as e
+from disk_cache import DiskCache
+from opening_book import OpeningBook
 
 BOX_DIM = 400, 200
 DEBUG_FIELD_WIDTH = 400
@@ -11,8 +17,155 @@ DEBUG_FONT_SIZE = 20
 TEXT_PADDING = 40
 PLAY_WITH_BOT = False
 BOT_CALCULATING_TIME = 1000
+BOT_PONDERING = True  # search on the human's time
+BOT_CACHE_FILE = None  # path of a disk cache that keeps the bot's search results between games
+BOT_BOOK_FILE = None  # path of an opening book written by opening_book.py build
+FRAMES_PER_SECOND = 30
 
 
+class BotSearch:
+    """Runs Engine.get_move on a copy of the board in a background thread, so that the event
+    loop keeps drawing and handling events while the bot thinks.
+
+    With pondering, the bot goes on searching the position after the human's reply predicted
+    by its principal variation while the human thinks. If the human plays it, that search
+    becomes the bot's move search with a head start, otherwise it is dropped. Either way
+    the transposition table and move ordering stay warm.
+    """
+
+    def __init__(self, engine, time_to_calc, ponder=False):
+        self.engine = engine
+        self.time_to_calc = time_to_calc
+        self.ponder_enabled = ponder
+        self.thread = None
+        self.cancelled = False
+        self.move = None
+        self.debug = None
+        # hash of the position pondered on and the human's move leading to it, None if not pondering
+        self.ponder_key = None
+        self.predicted_move = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    def running(self):
+        """Whether the bot is searching for its own move, pondering does not count."""
+        return self.thread is not None and self.ponder_key is None
+
+    def pondering(self):
+        return self.thread is not None and self.ponder_key is not None
+
+    def start(self, board):
+        if self.ponder_key is not None:
+            if BitBoard.from_board(board).hash == self.ponder_key:
+                self.ponder_hits += 1
+                self.ponder_key = None
+                self.engine.ponder_hit(self.time_to_calc)
+                return
+            self.stop_pondering()
+        self.__launch(board, False)
+
+    def stop_pondering(self):
+        """Drops the pondering after the human played another move than predicted."""
+        if self.ponder_key is not None:
+            self.ponder_misses += 1
+            self.cancel()
+
+    def ponder(self, board):
+        """Ponders on board after the bot's move if its principal variation predicts a reply
+        that gives the turn back to the bot."""
+        if not self.ponder_enabled or self.thread is not None or len(self.engine.pv_line) < 2:
+            return
+        predicted = to_pos(self.engine.pv_line[1])
+        if predicted not in board.get_legal_moves():
+            return
+        bot_is_fst = board.current_player == board.snd_player
+        board = deepcopy(board)
+        board.perform_move(predicted)
+        if board.round_over or (board.current_player == board.fst_player) != bot_is_fst:
+            return
+        self.ponder_key = BitBoard.from_board(board).hash
+        self.predicted_move = predicted
+        self.__launch(board, True)
+
+    def __launch(self, board, ponder):
+        self.cancelled = False
+        self.move = self.debug = None
+        self.engine.reset_limits()
+        self.thread = threading.Thread(target=self.__search, args=(deepcopy(board), ponder), daemon=True)
+        self.thread.start()
+
+    def __search(self, board, ponder):
+        move, debug = self.engine.get_move(board, None if ponder else self.time_to_calc, ponder=ponder)
+        if not self.cancelled:
+            self.move, self.debug = move, debug
+
+    def force_move(self):
+        """Plays the best move of the last completed depth now."""
+        if self.running():
+            self.engine.stop()
+
+    def cancel(self):
+        """Stops the search or pondering without a move."""
+        if self.thread is not None:
+            self.cancelled = True
+            self.engine.stop()
+            self.thread.join()
+            self.thread = None
+        if self.ponder_key is not None:
+            self.ponder_key = None
+
+    def result(self):
+        """(move, debug lines) once the search is done, None while it runs or after cancel."""
+        if not self.running() or self.thread.is_alive():
+            return None
+        self.thread = None
+        if self.cancelled:
+            return None
+        return self.move, self.debug + ([f'ponder hits: {self.ponder_hit_rate():.0%}'] if self.ponder_enabled else [])
+
+    def ponder_hit_rate(self):
+        guesses = self.ponder_hits + self.ponder_misses
+        return self.ponder_hits / guesses if guesses else 0
+
+    def progress(self):
+        engine = self.engine
+        best_move = engine.current_best_move
+        return ['thinking...',
+                f'depth {engine.current_depth}',
+                'best move ' + ('-' if best_move is None else str(to_pos(best_move))),
+                f'{engine.nodes} nodes',
+                'space: move now, esc: cancel']
+
+
+class BoardView:
+    """Draws a board onto surface from cached cell images, only blitting the cells whose
+    stone or legal-move marker changed since the last draw."""
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.keys = [None] * (game.BLEN * game.BLEN)
+        # cell key of draw.cell_keys -> pygame surface of draw.cell_image
+        self.cell_surfaces = {}
+
+    def invalidate(self):
+        """Redraws every cell next time, after something was drawn over the board."""
+        self.keys = [None] * (game.BLEN * game.BLEN)
+
+    def draw(self, board):
+        """Returns the dirty rectangles for pygame.display.update."""
+        dirty = []
+        for index, key in enumerate(draw.cell_keys(board)):
+            if key == self.keys[index]:
+                continue
+            cell = self.cell_surfaces.get(key)
+            if cell is None:
+                image = draw.cell_image(key)
+                cell = self.cell_surfaces[key] = pygame.image.frombuffer(image.tobytes(), image.size, 'RGB').copy()
+            row, col = divmod(index, game.BLEN)
+            dirty.append(self.surface.blit(cell, (col * CELL_PIXELS, row * CELL_PIXELS)))
+            self.keys[index] = key
+        return dirty
+
 
 def __make_occupy_consistent(board):
     for row, col in product(range(game.BLEN), repeat=2):
@@ -22,17 +175,15 @@ def __make_occupy_consistent(board):
 
 def run():
     def update_image():
-        img = pygame.image.frombuffer(board.draw().tobytes(), (BOARD_PIXELS, ) * 2, 'RGB')
-        window.blit(img, (0, 0))
-        pygame.display.update()
+        pygame.display.update(board_view.draw(board))
 
     def render_debug_text(player, text):
         height_pos = 0 if player == board.snd_player else BOARD_PIXELS - DEBUG_FONT_SIZE * len(text)
-        pygame.draw.rect(window, (255, 255, 255), ((0, 0), (BOARD_PIXELS + DEBUG_FIELD_WIDTH, BOARD_PIXELS)))
+        panel = pygame.draw.rect(window, (255, 255, 255), ((BOARD_PIXELS, 0), (DEBUG_FIELD_WIDTH, BOARD_PIXELS)))
         for index, text_bite in enumerate(text):
             text_obj = debug_font.render(text_bite, True, (0, 0, 0))
             window.blit(text_obj, (BOARD_PIXELS + 10, height_pos + index * DEBUG_FONT_SIZE))
-        pygame.display.update()
+        pygame.display.update(panel)
 
     def render_fill_menu():
         text = small_font.render('Fill from', True, (0, 0, 0))
@@ -46,7 +197,8 @@ def run():
                              box.centery - right_text.get_height() // 2)
         window.blit(left_text, left_text_coords)
         window.blit(right_text, right_text_coords)
-        pygame.display.update()
+        board_view.invalidate()
+        pygame.display.update(box)
 
     def handle_round_end():
         if board.winner is not None:
@@ -54,29 +206,48 @@ def run():
             window.blit(winner_text,
                         (BOARD_PIXELS / 2 - winner_text.get_width() // 2,
                          BOARD_PIXELS / 2 - winner_text.get_height() // 2))
+            board_view.invalidate()
             pygame.display.update()
             pygame.time.wait(5 * 1000)
         else:
             render_fill_menu()
 
+    def start_bot():
+        if PLAY_WITH_BOT and board.current_player == BOT_PLAYER and board.current_color is not None \
+                and not board.round_over:
+            bot_search.start(board)
+        else:
+            bot_search.stop_pondering()
+
     def handle_round():
         if board.current_color is None:
             if pos[0] == 7:
                 board.set_color(board.current_player.stones.index(pos))
                 update_image()
+                start_bot()
         else:
             try:
                 board.perform_move(pos)
             except game.GameException:
-                pass
+                return
+            update_image()
             if board.round_over:
+                bot_search.stop_pondering()
                 handle_round_end()
-            if PLAY_WITH_BOT:
-                engine = e.Engine()
-                move = engine.get_move(board, BOT_CALCULATING_TIME)
-                board.perform_move(move[0])
-                render_debug_text(BOT_PLAYER, move[1])
-            update_image()
+            else:
+                start_bot()
+
+    def handle_bot_move(move, debug):
+        board.perform_move(move)
+        render_debug_text(BOT_PLAYER, debug)
+        update_image()
+        if board.round_over:
+            handle_round_end()
+        elif board.current_player == BOT_PLAYER:
+            # the bot moves again if the human's turn was skipped
+            start_bot()
+        else:
+            bot_search.ponder(board)
 
     pygame.init()
     big_font = pygame.font.SysFont('Arial', 100, True)
@@ -85,23 +256,46 @@ def run():
     pygame.display.set_caption('Kamisado')
     window = pygame.display.set_mode((BOARD_PIXELS + DEBUG_FIELD_WIDTH, BOARD_PIXELS))
     box_top_left = BOARD_PIXELS // 2 - BOX_DIM[0] / 2, BOARD_PIXELS // 1.3 - BOX_DIM[1] / 2
+    board_view = BoardView(window)
 
     board = game.Board()
     BOT_PLAYER = board.snd_player
+    cache = None if BOT_CACHE_FILE is None else DiskCache(BOT_CACHE_FILE)
+    book = None if BOT_BOOK_FILE is None else OpeningBook.load(BOT_BOOK_FILE)
+    engine = e.Engine(disk_cache=cache, book=book)
+    bot_search = BotSearch(engine, BOT_CALCULATING_TIME, BOT_PONDERING)
 
     update_image()
-    event = pygame.event.Event(0)
-    while event.type != pygame.QUIT and board.winner is None:
-        event = pygame.event.wait()
-        if event.type != pygame.MOUSEBUTTONDOWN:
-            continue
-        pos = event.pos[1] // CELL_PIXELS, event.pos[0] // CELL_PIXELS
-        if not board.round_over:
-            handle_round()
-        elif all(box_top_left[i] < event.pos[i] < box_top_left[i] + BOX_DIM[i] for i in (0, 1)):
-            # Click inside box
-            board.reset(from_right=event.pos[0] > box_top_left[0] + BOX_DIM[0] // 2)
-            update_image()
+    clock = pygame.time.Clock()
+    quitting = False
+    while not quitting and board.winner is None:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quitting = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                bot_search.force_move()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                # the human makes the bot's move instead
+                bot_search.cancel()
+                render_debug_text(BOT_PLAYER, ['search cancelled'])
+            elif event.type == pygame.MOUSEBUTTONDOWN and not bot_search.running():
+                pos = event.pos[1] // CELL_PIXELS, event.pos[0] // CELL_PIXELS
+                if not board.round_over:
+                    handle_round()
+                elif all(box_top_left[i] < event.pos[i] < box_top_left[i] + BOX_DIM[i] for i in (0, 1)):
+                    # Click inside box
+                    board.reset(from_right=event.pos[0] > box_top_left[0] + BOX_DIM[0] // 2)
+                    update_image()
+        if bot_search.running():
+            result = bot_search.result()
+            if result is not None:
+                handle_bot_move(*result)
+            elif bot_search.running():
+                render_debug_text(BOT_PLAYER, bot_search.progress())
+        clock.tick(FRAMES_PER_SECOND)
+    bot_search.cancel()
+    if cache is not None:
+        cache.close()
     pygame.quit()
 
 
@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import struct
+import time
+
+import game
+from bitboard import BitBoard, mirror_square, to_pos
+from engine import Engine
+
+MAGIC = b'KMOB'
+HEADER = struct.Struct('<4sI')  # magic, entry count
+ENTRY = struct.Struct('<QBBi')  # table key, move, depth, score * SCORE_SCALE
+SCORE_SCALE = round(1 / Engine.SCORE_STEP)  # a stored score counts steps of Engine.SCORE_STEP
+
+
+class OpeningBook:
+    """Best moves of opening positions, keyed by the canonical BitBoard table key.
+
+    A mirrored twin of a book position finds its entry as well, the move is mirrored back.
+    The file is a header followed by fixed-size entries sorted by key.
+    """
+
+    def __init__(self, entries=None):
+        # table key -> (move, depth, score) with the move relative to the canonical position
+        self.entries = {} if entries is None else entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, board: BitBoard, move, depth, score):
+        key, mirrored = board.table_key()
+        self.entries[key] = mirror_square(move) if mirrored else move, depth, score
+
+    def lookup(self, board: BitBoard):
+        """Returns (move, depth, score) for board, None if it is not in the book."""
+        key, mirrored = board.table_key()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        move, depth, score = entry
+        return mirror_square(move) if mirrored else move, depth, score
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, len(self.entries)))
+            for key in sorted(self.entries):
+                move, depth, score = self.entries[key]
+                file.write(ENTRY.pack(key, move, depth, int(score * SCORE_SCALE)))
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) != HEADER.size + count * ENTRY.size:
+            raise ValueError(f'{path} is not an opening book')
+        return OpeningBook({key: (move, depth, scaled / SCORE_SCALE)
+                            for key, move, depth, scaled in ENTRY.iter_unpack(data[HEADER.size:])})
+
+
+def start_position(color):
+    board = game.Board()
+    board.set_color(color)
+    return BitBoard.from_board(board)
+
+
+def opening_positions(plies):
+    """BitBoards of the first round up to plies half-moves after the first color is chosen,
+    one per table key."""
+    positions = {}
+    frontier = []
+    for color in range(game.BLEN):
+        frontier.append(start_position(color))
+    for ply in range(plies + 1):
+        next_frontier = []
+        for board in frontier:
+            key = board.table_key()[0]
+            if key in positions or board.round_over:
+                continue
+            positions[key] = board
+            if ply < plies:
+                for move in board.get_legal_moves():
+                    child = BitBoard.from_board(board.to_board())
+                    child.do_move(move)
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return list(positions.values())
+
+
+def analyse(task):
+    board, depth = task
+    return Engine().think(board, depth=depth)[-1]
+
+
+def build(plies, depth, workers=None):
+    positions = opening_positions(plies)
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(analyse, [(board, depth) for board in positions], chunksize=1)
+    book = OpeningBook()
+    for board, (completed_depth, score, move) in zip(positions, results):
+        book.add(board, move, completed_depth, score)
+    return book
+
+
+def show(path):
+    book = OpeningBook.load(path)
+    print(f'{path}: {len(book)} positions')
+    for color in range(game.BLEN):
+        entry = book.lookup(start_position(color))
+        if entry is not None:
+            move, depth, score = entry
+            print(f'color {color}: {to_pos(move)} depth {depth} score {score}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or show an opening book')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='search all opening positions in parallel')
+    build_parser.add_argument('output')
+    build_parser.add_argument('--plies', type=int, default=2, help='half-moves after the first color is chosen')
+    build_parser.add_argument('--depth', type=int, default=8)
+    build_parser.add_argument('--workers', type=int, default=None)
+    show_parser = commands.add_parser('show', help='size and first moves of a book')
+    show_parser.add_argument('path')
+    args = parser.parse_args()
+    if args.command == 'build':
+        start = time.perf_counter()
+        opening_book = build(args.plies, args.depth, args.workers)
+        opening_book.save(args.output)
+        print(f'{len(opening_book)} positions in {time.perf_counter() - start:.1f}s written to {args.output}')
+    elif args.command == 'show':
+        show(args.path)
@@ -0,0 +1,78 @@
+import multiprocessing
+from copy import deepcopy
+
+import game
+from bitboard import BitBoard, to_pos
+from engine import Engine
+from disk_cache import DiskCache
+from transposition import TranspositionTable, describe_counters
+
+worker_engine = None
+
+
+def init_worker(table_megabytes, cache_path=None):
+    global worker_engine
+    worker_engine = Engine(table_megabytes, disk_cache=None if cache_path is None else DiskCache(cache_path))
+
+
+def search_root_moves(task):
+    board, root_moves, time_to_calc, node_limit, depth = task
+    counters = worker_engine.table.counters()
+    iterations = worker_engine.think(board, time_to_calc, node_limit, depth, root_moves)
+    counters = [after - before for after, before in zip(worker_engine.table.counters(), counters)]
+    return iterations, worker_engine.nodes, worker_engine.positions_evaluated, counters
+
+
+class ParallelEngine(Engine):
+    """Engine splitting the root moves over a pool of worker processes.
+
+    Every worker iteratively deepens on its own board copy and table, but only tries its
+    share of the root moves. The move is taken from the deepest depth all workers completed.
+    A node limit is divided evenly between the workers. With cache_path, all workers share
+    one disk_cache.DiskCache file.
+
+    Pondering runs in this process, a stop or ponder_hit from another thread cannot reach the workers.
+    """
+
+    def __init__(self, workers=None, table_megabytes=16, cache_path=None):
+        super().__init__(table_megabytes=0)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.table_megabytes = table_megabytes
+        self.cache_path = cache_path
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.workers, init_worker, (self.table_megabytes, self.cache_path))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    def get_move(self, current_board: game.Board, time_to_calc=None, node_limit=None, depth=None, ponder=False):
+        if ponder:
+            if self.table.size == 1:
+                self.table = TranspositionTable(self.table_megabytes)
+            return super().get_move(current_board, time_to_calc, node_limit, depth, ponder=True)
+        self.check_searchable(current_board)
+        board = BitBoard.from_board(current_board)
+        moves = list(board.iter_moves())
+        shares = [moves[worker::self.workers] for worker in range(min(self.workers, len(moves)))]
+        share_limit = None if node_limit is None else max(1, node_limit // len(shares))
+        self.start()
+        results = self.pool.map(search_root_moves,
+                                [(board, share, time_to_calc, share_limit, depth) for share in shares])
+
+        completed_depth = min(len(iterations) for iterations, *_ in results)
+        _, eval_score, best_move = max((iterations[completed_depth - 1] for iterations, *_ in results),
+                                       key=lambda iteration: iteration[1])
+        self.nodes = sum(nodes for _, nodes, _, _ in results)
+        self.positions_evaluated = sum(positions for _, _, positions, _ in results)
+        counters = [sum(values) for values in zip(*(counters for *_, counters in results))]
+
+        best_move = to_pos(best_move)
+        board_copy = deepcopy(current_board)
+        board_copy.perform_move(best_move)
+        debug = self.describe(eval_score, self.positions_evaluated, completed_depth) + describe_counters(*counters)
+        return best_move, debug + [f'{len(shares)} workers']
@@ -0,0 +1,166 @@
+import argparse
+import time
+from copy import deepcopy
+
+import game
+from bitboard import BitBoard, FST, SND
+
+EVENTS = 'nodes', 'wins', 'sumos', 'skips', 'deadlocks'
+
+
+def position(color, moves=(), fst_stones=None, snd_stones=None, fst_levels=None, snd_levels=None, snd_to_move=False):
+    """game.Board with stones and sumo levels set up directly, then moves played from it."""
+    board = game.Board()
+    if fst_stones is not None:
+        board.fst_player.stones = list(fst_stones)
+        board.snd_player.stones = list(snd_stones)
+        board.occupied = [[False] * game.BLEN for _ in range(game.BLEN)]
+        for row, col in board.fst_player.stones + board.snd_player.stones:
+            board.occupied[row][col] = True
+    if fst_levels is not None:
+        board.fst_player.sumo_levels = list(fst_levels)
+    if snd_levels is not None:
+        board.snd_player.sumo_levels = list(snd_levels)
+    if snd_to_move:
+        board.current_player = board.snd_player
+    board.set_color(color)
+    for move in moves:
+        board.perform_move(move)
+    return board
+
+
+# reference positions, each reaching a different part of the rules within a few plies
+POSITIONS = {
+    'start': lambda: position(0),
+    'opening': lambda: position(0, [(5, 0), (4, 5), (5, 6), (4, 3)]),
+    'sumos': lambda: position(
+        0, fst_stones=[(4, 4), (7, 1), (7, 2), (5, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+        snd_stones=[(3, 4), (2, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)],
+        fst_levels=[2, 0, 0, 1, 0, 0, 0, 0], snd_levels=[0, 1, 0, 0, 0, 0, 0, 3]),
+    'puzzle': lambda: position(
+        6, fst_stones=[(4, 0), (5, 0), (3, 0), (6, 3), (4, 4), (4, 6), (1, 6), (6, 7)],
+        snd_stones=[(4, 5), (1, 5), (3, 5), (3, 1), (3, 3), (5, 2), (1, 0), (3, 2)], snd_to_move=True),
+}
+
+
+def reference_perft(board: game.Board, depth, counts):
+    """The validated path: get_legal_moves and perform_move on a copy of the board."""
+    moves = board.get_legal_moves()
+    if depth == 1 and counts is None:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        child = deepcopy(board)
+        child.perform_move(move)
+        if depth > 1:
+            nodes += reference_perft(child, depth - 1, counts)
+            continue
+        nodes += 1
+        sumo = board.occupied[move[0]][move[1]]
+        win = child.round_over and move[0] == game.BLEN - 1 - board.current_player.start_row
+        same_player = (child.current_player is child.fst_player) == (board.current_player is board.fst_player)
+        count_leaf(counts, sumo, win, same_player and not child.round_over, child.round_over and not win)
+    return nodes
+
+
+def apply_perft(board: game.Board, depth, counts):
+    moves = board.get_classified_moves()
+    if depth == 1 and counts is None:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        record = board.apply_move(move)
+        if depth > 1:
+            nodes += apply_perft(board, depth - 1, counts)
+        else:
+            nodes += 1
+            kind = move[1]
+            count_leaf(counts, kind == game.SUMO_MOVE, kind == game.WINNING_MOVE,
+                       record.old_player is board.current_player and not board.round_over,
+                       board.round_over and kind != game.WINNING_MOVE)
+        board.revert_move(record)
+    return nodes
+
+
+def bitboard_perft(board: BitBoard, depth, counts):
+    moves = board.get_legal_moves()
+    if depth == 1 and counts is None:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        sumo = (board.occupied[FST] | board.occupied[SND]) >> move & 1
+        record = board.do_move(move)
+        if depth > 1:
+            nodes += bitboard_perft(board, depth - 1, counts)
+        else:
+            nodes += 1
+            count_leaf(counts, sumo, board.round_over and not record.was_deadlock,
+                       record.old_player == board.current_player and not board.round_over, record.was_deadlock)
+        board.undo_move(record)
+    return nodes
+
+
+def count_leaf(counts, sumo, win, skip, deadlock):
+    counts['sumos'] += sumo
+    counts['wins'] += win
+    counts['skips'] += skip
+    counts['deadlocks'] += deadlock
+
+
+# name -> (conversion of the reference game.Board, perft function)
+BACKENDS = {
+    'reference': (deepcopy, reference_perft),
+    'apply': (deepcopy, apply_perft),
+    'bitboard': (BitBoard.from_board, bitboard_perft),
+}
+
+
+def perft(board: game.Board, depth, backend='reference', bulk=False):
+    """Counts the move sequences of depth half-moves from board. A finished round ends a
+    sequence early and is not counted.
+
+    Returns a dict of EVENTS, the last four counting what the final half-moves did: winning
+    moves, sumo pushes, moves skipping the opponent and moves causing a deadlock. With bulk,
+    the final half-moves are only generated, not made, and only nodes are counted.
+    """
+    convert, function = BACKENDS[backend]
+    if depth == 0:
+        return {'nodes': 1}
+    counts = None if bulk else dict.fromkeys(EVENTS, 0)
+    nodes = function(convert(board), depth, counts)
+    return {'nodes': nodes} if bulk else dict(counts, nodes=nodes)
+
+
+def run(names, depths, backends, bulk):
+    """Prints the counts and speed of every backend and flags those disagreeing with the first one."""
+    agreed = True
+    print(f'{"position":<10}{"depth":>6}  {"backend":<10}{"nodes":>12}{"seconds":>10}{"nodes/s":>12}  events')
+    for name in names:
+        board = POSITIONS[name]()
+        for depth in depths:
+            expected = None
+            for backend in backends:
+                start = time.perf_counter()
+                counts = perft(board, depth, backend, bulk)
+                elapsed = time.perf_counter() - start
+                if expected is None:
+                    expected = counts
+                mismatch = counts != expected
+                agreed &= not mismatch
+                events = ' '.join(f'{event} {counts[event]}' for event in EVENTS[1:] if event in counts)
+                print(f'{name:<10}{depth:>6}  {backend:<10}{counts["nodes"]:>12}{elapsed:>10.3f}'
+                      f'{counts["nodes"] / elapsed if elapsed else 0:>12.0f}  {events}'
+                      + ('  MISMATCH' if mismatch else ''))
+    return agreed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Count and time the game tree of reference positions')
+    parser.add_argument('--depth', type=int, nargs='+', default=[1, 2, 3, 4])
+    parser.add_argument('--positions', nargs='+', choices=list(POSITIONS), default=list(POSITIONS))
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS),
+                        help='the first one is the reference for the others')
+    parser.add_argument('--bulk', action='store_true', help='count the last half-moves without making them')
+    args = parser.parse_args()
+    if not run(args.positions, args.depth, args.backends, args.bulk):
+        raise SystemExit('backends disagree')
@@ -0,0 +1,147 @@
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+from PIL import Image, GifImagePlugin
+
+import game
+import draw
+import game_record
+
+FRAME_DURATION = 600  # milliseconds per position in an animated GIF
+BATCH_FRAMES = 32  # frames in flight per worker, bounds the memory of a long game
+# every color draw uses, the drawing is not antialiased so a GIF needs no other
+PALETTE_COLORS = sorted({(0, 0, 0), *draw.COLORS, *(rgb for colors in draw.player_colors.values()
+                                                    for rgb in colors.values())})
+
+
+def palette_image():
+    image = Image.new('P', (1, 1))
+    image.putpalette([channel for rgb in PALETTE_COLORS for channel in rgb])
+    return image
+
+
+def replay_frames(match):
+    """Replays the rounds of a match record through game.Board and generates the cell keys
+    of every position: each round once its first color is set and after every move."""
+    board = game.Board(match.get('winning_points', 3))
+    for record in match['rounds']:
+        board.set_color(record['color'])
+        yield draw.cell_keys(board)
+        for move in record['moves']:
+            board.perform_move(tuple(move))
+            yield draw.cell_keys(board)
+        if 'from_right' in record:
+            board.reset(from_right=record['from_right'])
+
+
+def compose(keys):
+    image = Image.new('RGB', (draw.BOARD_PIXELS, ) * 2)
+    for index, key in enumerate(keys):
+        row, col = divmod(index, game.BLEN)
+        image.paste(draw.cell_image(key), (col * draw.CELL_PIXELS, row * draw.CELL_PIXELS))
+    return image
+
+
+def render_png(keys):
+    output = io.BytesIO()
+    compose(keys).save(output, 'PNG', compress_level=1)
+    return output.getvalue()
+
+
+def render_gif_frame(keys):
+    """The image block of one GIF frame, indexed into the shared palette."""
+    frame = compose(keys).quantize(palette=palette_image(), dither=Image.Dither.NONE)
+    return b''.join(GifImagePlugin.getdata(frame, duration=FRAME_DURATION))
+
+
+def gif_header():
+    frame = palette_image().resize((draw.BOARD_PIXELS, ) * 2)
+    header, _ = GifImagePlugin.getheader(frame, info={'loop': 0, 'duration': FRAME_DURATION})
+    return b''.join(header)
+
+
+def batches(frames, size):
+    batch = []
+    for keys in frames:
+        batch.append(keys)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export(match, output, image_format='gif', pool=None, workers=1):
+    """Renders every position of match to output, a GIF file or a directory of numbered PNG
+    frames. Frames are rendered in batches by pool and written as they come, so memory does
+    not grow with the length of the game. Returns the number of frames."""
+    render = render_gif_frame if image_format == 'gif' else render_png
+    mapper = pool.map if pool is not None else lambda function, items: list(map(function, items))
+    count = 0
+    if image_format == 'gif':
+        file = open(output, 'wb')
+        file.write(gif_header())
+    else:
+        os.makedirs(output, exist_ok=True)
+    try:
+        for batch in batches(replay_frames(match), BATCH_FRAMES * workers):
+            for data in mapper(render, batch):
+                if image_format == 'gif':
+                    file.write(data)
+                else:
+                    with open(os.path.join(output, f'frame_{count:04d}.png'), 'wb') as frame_file:
+                        frame_file.write(data)
+                count += 1
+    finally:
+        if image_format == 'gif':
+            file.write(b';')
+            file.close()
+    return count
+
+
+def peak_memory_megabytes():
+    """Peak resident memory of this process and of the largest finished child process, None
+    where the resource module is missing, as on Windows."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 2 ** 20 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return own, children
+
+
+def export_all(path, output_dir, image_format='gif', workers=None, games=None):
+    """Exports the games of a tournament.py result file, all or only those indexed in games."""
+    workers = workers or os.cpu_count()
+    os.makedirs(output_dir, exist_ok=True)
+    frames = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        for match in game_record.read_matches(path):
+            if games is not None and match['game'] not in games:
+                continue
+            name = f'game_{match["game"]}' + ('.gif' if image_format == 'gif' else '')
+            frames += export(match, os.path.join(output_dir, name), image_format, pool, workers)
+    elapsed = time.perf_counter() - start
+    return frames, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render stored games to image sequences')
+    parser.add_argument('games', help='JSON lines of matches written by tournament.py or a game record file')
+    parser.add_argument('output', help='directory for one GIF or PNG frame directory per game')
+    parser.add_argument('--format', choices=('gif', 'png'), default='gif')
+    parser.add_argument('--game', type=int, nargs='+', help='indices of the games to export, all by default')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    exported, seconds = export_all(args.games, args.output, args.format, args.workers, args.game)
+    memory = peak_memory_megabytes()
+    print(f'{exported} frames in {seconds:.1f}s, {exported / seconds if seconds else 0:.1f} frames/s'
+          + ('' if memory is None else f', peak memory {memory[0]:.0f} MB main, {memory[1]:.0f} MB largest worker'))
@@ -0,0 +1,77 @@
+import json
+
+
+class SearchStats:
+    """Opt-in search instrumentation for Engine.
+
+    Pass an instance as Engine(stats=...) to collect it. Counters are indexed by half-moves
+    from the root and restart with every iteration of get_move, the finished iterations of
+    the last search are kept in iterations. With stream set, every iteration of every search
+    is also written as a JSON line.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.start_search()
+
+    def start_search(self):
+        self.iterations = []
+        self.start_iteration()
+
+    def start_iteration(self):
+        self.nodes = []
+        self.cutoffs = []
+        self.first_move_cutoffs = []
+        self.evaluations = 0
+
+    def node(self, ply):
+        while len(self.nodes) <= ply:
+            self.nodes.append(0)
+            self.cutoffs.append(0)
+            self.first_move_cutoffs.append(0)
+        self.nodes[ply] += 1
+
+    def cutoff(self, ply, move_index):
+        self.cutoffs[ply] += 1
+        if move_index == 0:
+            self.first_move_cutoffs[ply] += 1
+
+    def cutoff_rate(self):
+        inner_nodes = sum(self.nodes) - self.evaluations
+        return sum(self.cutoffs) / inner_nodes if inner_nodes > 0 else 0
+
+    def first_move_cutoff_ratio(self):
+        cutoffs = sum(self.cutoffs)
+        return sum(self.first_move_cutoffs) / cutoffs if cutoffs else 0
+
+    def finish_iteration(self, depth, seconds, score, move, aborted=False):
+        nodes = sum(self.nodes)
+        previous = self.iterations[-1]['nodes'] if self.iterations else 0
+        record = {
+            'depth': depth,
+            'aborted': aborted,
+            'nodes': nodes,
+            'evaluations': self.evaluations,
+            'ms': round(seconds * 1000, 3),
+            'score': score,
+            'move': move,
+            'branching': round(nodes / previous, 3) if previous else None,
+            'cutoff_rate': round(self.cutoff_rate(), 4),
+            'first_move_cutoffs': round(self.first_move_cutoff_ratio(), 4),
+            'nodes_per_ply': self.nodes,
+            'cutoffs_per_ply': self.cutoffs,
+        }
+        self.iterations.append(record)
+        if self.stream is not None:
+            self.stream.write(json.dumps(record) + '\n')
+            self.stream.flush()
+        self.start_iteration()
+        return record
+
+    def effective_branching_factor(self):
+        """Geometric mean growth of the node count between the completed iterations."""
+        completed = [record for record in self.iterations if not record['aborted']]
+        if len(completed) < 2:
+            return None
+        first, last = completed[0], completed[-1]
+        return (last['nodes'] / first['nodes']) ** (1 / (last['depth'] - first['depth']))
@@ -0,0 +1,125 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import game
+import game_record
+from bitboard import BitBoard, to_pos
+from engine import Engine
+
+NAMES = 'A', 'B'
+
+
+def wilson_interval(wins, games, z=1.96):
+    """95% confidence interval of a win rate, still sensible for few games or lopsided results."""
+    if games == 0:
+        return 0, 1
+    rate = wins / games
+    center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+    spread = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+    return center - spread, center + spread
+
+
+def play_match(task):
+    """Plays one match of engine configurations A and B to winning_points.
+
+    The first color of each round and the side the stones are filled from on a reset are
+    picked at random from seed, as the engine does not choose them.
+    """
+    index, configs, a_is_white, limits, winning_points, seed = task
+    rng = random.Random(seed)
+    bots = [Engine(**config) for config in configs]
+    white, black = (0, 1) if a_is_white else (1, 0)
+    board = game.Board(winning_points)
+    rounds = []
+    start = time.perf_counter()
+    while True:
+        color = rng.randrange(game.BLEN)
+        board.set_color(color)
+        record = {'color': color, 'moves': [], 'scores': [], 'nodes': [], 'ms': []}
+        while not board.round_over:
+            bot = bots[white if board.current_player == board.fst_player else black]
+            move_start = time.perf_counter()
+            depth, score, move = bot.think(BitBoard.from_board(board), **limits)[-1]
+            record['ms'].append(round((time.perf_counter() - move_start) * 1000, 3))
+            record['moves'].append(to_pos(move))
+            record['scores'].append(score)
+            record['nodes'].append(bot.nodes)
+            board.perform_move(to_pos(move))
+        record['winner'] = NAMES[white if board.current_player == board.fst_player else black]
+        rounds.append(record)
+        if board.winner is not None:
+            break
+        record['from_right'] = rng.random() < .5
+        board.reset(from_right=record['from_right'])
+    return {
+        'game': index,
+        'white': NAMES[white],
+        'winning_points': winning_points,
+        'winner': NAMES[white if board.winner == board.fst_player else black],
+        'points': {NAMES[white]: board.fst_player.get_points(), NAMES[black]: board.snd_player.get_points()},
+        'rounds': rounds,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def tasks(games, configs, limits, winning_points, seed):
+    for index in range(games):
+        yield index, configs, index % 2 == 0, limits, winning_points, seed * 1000003 + index
+
+
+def run(games, configs, limits, winning_points=3, workers=None, seed=0, stream=sys.stdout, record_path=None):
+    """Plays games matches with alternating colors over a process pool, writes each result as
+    a JSON line to stream as soon as it is done and returns the summary. With record_path,
+    the moves of every match are appended to that game_record file as well."""
+    wins = {name: 0 for name in NAMES}
+    start = time.perf_counter()
+    writer = None if record_path is None else game_record.RecordWriter(record_path)
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(play_match, tasks(games, configs, limits, winning_points, seed)):
+                wins[result['winner']] += 1
+                if stream is not None:
+                    stream.write(json.dumps(result) + '\n')
+                    stream.flush()
+                if writer is not None:
+                    writer.write(game_record.from_match(result))
+    finally:
+        if writer is not None:
+            writer.close()
+    minutes = (time.perf_counter() - start) / 60
+    low, high = wilson_interval(wins['A'], games)
+    return {'games': games, 'wins': wins, 'games_per_minute': games / minutes if minutes else 0,
+            'a_win_rate': wins['A'] / games if games else 0, 'a_interval': (low, high)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Engine against engine matches')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None, help='processes, all cores by default')
+    parser.add_argument('--time', type=int, default=None, help='milliseconds per move')
+    parser.add_argument('--nodes', type=int, default=None, help='nodes per move')
+    parser.add_argument('--depth', type=int, default=None, help='fixed depth per move')
+    parser.add_argument('--points', type=int, default=3, help='winning points of a match')
+    parser.add_argument('--a', type=json.loads, default={}, help='Engine keyword arguments of A as JSON')
+    parser.add_argument('--b', type=json.loads, default={}, help='Engine keyword arguments of B as JSON')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='file for the JSON lines of the games instead of stdout')
+    parser.add_argument('--record', help='game record file to append the moves of the games to')
+    args = parser.parse_args()
+    if args.time is None and args.nodes is None and args.depth is None:
+        parser.error('give at least one of --time, --nodes and --depth')
+    move_limits = {'time_to_calc': args.time, 'node_limit': args.nodes, 'depth': args.depth}
+    output = open(args.output, 'w') if args.output else sys.stdout
+    summary = run(args.games, (args.a, args.b), move_limits, args.points, args.workers, args.seed, output,
+                  args.record)
+    if args.output:
+        output.close()
+    low, high = summary['a_interval']
+    print(f'{summary["games"]} games, {summary["games_per_minute"]:.1f} games/min', file=sys.stderr)
+    print(f'A {summary["wins"]["A"]} : {summary["wins"]["B"]} B, A wins {summary["a_win_rate"]:.1%} '
+          f'(95% {low:.1%} - {high:.1%})', file=sys.stderr)
@@ -0,0 +1,74 @@
+EXACT, LOWER, UPPER = range(3)
+
+# approximate memory of one filled slot: key int, entry tuple, score and both list slots
+ENTRY_BYTES = 144
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by the BitBoard zobrist hash.
+
+    Entries are (depth, bound, score, move). A slot is replaced when it is empty, holds
+    the same position, was written during an older search, or holds a result searched
+    to a lower or equal depth. Otherwise the deeper result of the current search stays.
+    """
+
+    def __init__(self, megabytes=16):
+        self.size = 1
+        while self.size * 2 * ENTRY_BYTES <= megabytes * 2 ** 20:
+            self.size *= 2
+        self.mask = self.size - 1
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.generations = [0] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.generations = [0] * self.size
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    def probe(self, key):
+        index = key & self.mask
+        stored_key = self.keys[index]
+        if stored_key == key:
+            self.hits += 1
+            return self.entries[index]
+        self.misses += 1
+        if stored_key is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        stored_key = self.keys[index]
+        if (stored_key is not None and stored_key != key and self.generations[index] == self.generation
+                and self.entries[index][0] > depth):
+            return
+        self.keys[index] = key
+        self.entries[index] = depth, bound, score, move
+        self.generations[index] = self.generation
+        self.stores += 1
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0
+
+    def counters(self):
+        return self.hits, self.misses, self.collisions
+
+    def debug_lines(self):
+        return describe_counters(*self.counters())
+
+
+def describe_counters(hits, misses, collisions):
+    hit_rate = hits / (hits + misses) if hits + misses else 0
+    return [f'table: {hits} hits, {misses} misses',
+            f'{collisions} collisions, {hit_rate:.0%} hit rate']
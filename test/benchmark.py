@@ -0,0 +1,157 @@
+"""Timing of the hot paths against a saved baseline.
+
+    python ../test/benchmark.py            # fails if a rate dropped more than the tolerance
+    python ../test/benchmark.py --save     # measures and writes a new baseline
+
+Every benchmark is a rate, higher is better, and the best of several rounds is kept to
+filter out machine noise. Baselines only compare on the machine they were saved on.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+
+import bench  # noqa: E402
+import draw  # noqa: E402
+import game  # noqa: E402
+import engine  # noqa: E402
+from bitboard import BitBoard  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = .3
+SEARCH_DEPTH = 4
+REPEAT = 50  # inner repetitions of the short benchmarks, so that a round is not too quick to time
+
+
+def search_nodes_per_second(rounds):
+    boards = [BitBoard.from_board(board) for board in bench.bench_positions()]
+    nodes = 0
+
+    def search_round():
+        nonlocal nodes
+        nodes = 0
+        for board in boards:
+            bot = engine.Engine(table_megabytes=1)
+            bot.think(board, depth=SEARCH_DEPTH)
+            nodes += bot.nodes
+    # fixed depth searches the same tree every round
+    search_round()
+    return bench.best_rate(search_round, nodes, rounds)
+
+
+def score_position_per_second(rounds):
+    positions = bench.walk_positions(200)
+    bot = engine.Engine(table_megabytes=1)
+
+    def score_round():
+        for _ in range(REPEAT):
+            for board in positions:
+                # cold stone features, as on the first visit of a position in a search
+                board.features = [[None] * game.BLEN, [None] * game.BLEN]
+                bot.score_position(board)
+    return bench.best_rate(score_round, REPEAT * len(positions), rounds)
+
+
+def do_undo_per_second(rounds):
+    boards = [BitBoard.from_board(board) for board in bench.bench_positions()]
+    moves = [(board, board.get_legal_moves()) for board in boards]
+
+    def make_unmake_round():
+        for _ in range(REPEAT):
+            for board, board_moves in moves:
+                for move in board_moves:
+                    board.undo_move(board.do_move(move))
+    return bench.best_rate(make_unmake_round, REPEAT * sum(len(board_moves) for _, board_moves in moves), rounds)
+
+
+def legal_moves_per_second(rounds):
+    boards = bench.bench_positions() + [bench.sumo_board()]
+
+    def legal_moves_round():
+        for _ in range(REPEAT):
+            for board in boards:
+                board.get_legal_moves()
+    return bench.best_rate(legal_moves_round, REPEAT * len(boards), rounds)
+
+
+def draw_board_per_second(rounds):
+    boards = bench.bench_positions()[-3:] + [bench.sumo_board()]
+
+    def draw_round():
+        for board in boards:
+            draw.draw_board(board)
+    return bench.best_rate(draw_round, len(boards), rounds)
+
+
+BENCHMARKS = {
+    'search nodes/s': search_nodes_per_second,
+    'score_position/s': score_position_per_second,
+    'do_move/undo_move/s': do_undo_per_second,
+    'get_legal_moves/s': legal_moves_per_second,
+    'draw_board frames/s': draw_board_per_second,
+}
+
+
+def measure(names=None, rounds=7):
+    return {name: BENCHMARKS[name](rounds) for name in (names or BENCHMARKS)}
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_baseline(results, path=BASELINE_PATH, tolerance=DEFAULT_TOLERANCE):
+    with open(path, 'w') as file:
+        json.dump({'machine': platform.node(), 'python': platform.python_version(), 'tolerance': tolerance,
+                   'results': results}, file, indent=2)
+        file.write('\n')
+
+
+def compare(results, baseline, tolerance=None):
+    """Returns (name, rate, baseline rate) of every benchmark slower than its baseline by more
+    than tolerance, a fraction that defaults to the one saved with the baseline."""
+    if tolerance is None:
+        tolerance = baseline.get('tolerance', DEFAULT_TOLERANCE)
+    regressions = []
+    for name, rate in results.items():
+        expected = baseline['results'].get(name)
+        if expected is not None and rate < expected * (1 - tolerance):
+            regressions.append((name, rate, expected))
+    return regressions
+
+
+def report(results, baseline):
+    print(f'{"benchmark":<22}{"rate":>14}{"baseline":>14}{"change":>9}')
+    for name, rate in results.items():
+        expected = baseline['results'].get(name) if baseline else None
+        change = f'{rate / expected - 1:>+9.1%}' if expected else ''
+        print(f'{name:<22}{rate:>14.0f}{expected or 0:>14.0f}{change}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the hot paths with regression thresholds')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help=f'allowed slowdown as a fraction, the baseline\'s or {DEFAULT_TOLERANCE} by default')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--rounds', type=int, default=7)
+    args = parser.parse_args()
+    measured = measure(args.only, args.rounds)
+    saved = load_baseline(args.baseline) if os.path.exists(args.baseline) else None
+    report(measured, saved)
+    if args.save:
+        save_baseline(measured, args.baseline, DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance)
+        print(f'baseline written to {args.baseline}')
+    elif saved is None:
+        raise SystemExit(f'no baseline at {args.baseline}, run with --save first')
+    else:
+        slower = compare(measured, saved, args.tolerance)
+        for name, rate, expected in slower:
+            print(f'REGRESSION {name}: {rate:.0f} < {expected:.0f}')
+        if slower:
+            raise SystemExit(1)
@@ -0,0 +1,101 @@
+import io
+import json
+
+import pytest
+import analysis
+import engine
+import game_record
+import tournament
+from bitboard import BitBoard
+
+
+@pytest.fixture(scope='module')
+def match():
+    return tournament.play_match((0, ({}, {}), True, {'depth': 1}, 1, 3))
+
+
+def test_identical_positions_are_analysed_once(match):
+    twin = dict(match, game=1)
+    positions, count = analysis.collect_positions([match, twin])
+    moves = sum(len(record['moves']) for record in match['rounds'])
+    assert count == 2 * moves
+    assert len(positions) <= moves
+    assert sum(len(position.occurrences) for position in positions.values()) == count
+    for key, position in positions.items():
+        assert position.board.hash == key
+        assert {move for *_, move in position.occurrences} == position.played
+
+
+def test_results_stream_per_played_move(match, tmp_path):
+    path = str(tmp_path / 'games.kmgr')
+    with game_record.RecordWriter(path) as writer:
+        writer.write(game_record.from_match(match))
+        writer.write(game_record.from_match(dict(match, game=1)))
+    stream = io.StringIO()
+    summary = analysis.run(path, {'depth': 3}, workers=2, stream=stream)
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(rows) == summary['moves'] == 2 * sum(len(record['moves']) for record in match['rounds'])
+    assert summary['positions'] <= summary['moves'] // 2
+    by_game = [sorted((row['round'], row['ply'], row['played'], row['best'], row['score'], row['drop'])
+                      for row in rows if row['game'] == game) for game in (0, 1)]
+    assert by_game[0] == by_game[1]
+    for row in rows:
+        assert row['drop'] == row['score'] - row['played_score']
+        if row['played'] == row['best']:
+            assert row['drop'] == 0
+
+
+def test_played_move_score_matches_a_search_of_that_move(match):
+    positions, _ = analysis.collect_positions([match])
+    analysis.init_worker(1)
+    key, position = next(iter(positions.items()))
+    board = BitBoard.from_board(position.board.to_board())
+    _, best, score, depth, played_scores, _ = analysis.analyse((key, board, tuple(position.played), {'depth': 3}))
+    assert depth == 3
+    assert best in board.get_legal_moves()
+    for move, played_score in played_scores.items():
+        assert engine.Engine(1).think(board, depth=3, root_moves=(move, ))[-1][1] == played_score
+    assert position.played <= set(played_scores)
+
+
+def test_node_limit_never_gives_negative_drops(match, tmp_path):
+    path = str(tmp_path / 'games.kmgr')
+    with game_record.RecordWriter(path) as writer:
+        writer.write(game_record.from_match(match))
+    stream = io.StringIO()
+    analysis.run(path, {'node_limit': 1000}, workers=1, stream=stream)
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert rows and all(row['drop'] >= 0 for row in rows)
+
+
+def test_played_moves_are_searched_to_the_completed_depth(match, monkeypatch):
+    positions, _ = analysis.collect_positions([match])
+    key, position = next(iter(positions.items()))
+    board = BitBoard.from_board(position.board.to_board())
+    analysis.init_worker(1)
+    calls = []
+    think = analysis.worker_engine.think
+
+    def recording_think(searched, **limits):
+        calls.append(limits)
+        return think(searched, **limits)
+    monkeypatch.setattr(analysis.worker_engine, 'think', recording_think)
+    _, best, score, depth, played_scores, _ = analysis.analyse((key, board, tuple(board.get_legal_moves()),
+                                                                {'node_limit': 1000}))
+    assert calls[0] == {'node_limit': 1000}
+    assert sorted(limits['root_moves'] for limits in calls[1:]) == sorted((move, ) for move in board.get_legal_moves())
+    assert all(limits == {'depth': depth, 'root_moves': limits['root_moves']} for limits in calls[1:])
+    assert len(calls) == 1 + len(board.get_legal_moves())
+    assert score == max(played_scores.values()) == played_scores[best]
+
+
+def test_played_move_above_the_best_becomes_the_best(match, monkeypatch):
+    positions, _ = analysis.collect_positions([match])
+    key, position = next(iter(positions.items()))
+    board = BitBoard.from_board(position.board.to_board())
+    analysis.init_worker(1)
+    moves = board.get_legal_moves()
+    monkeypatch.setattr(analysis, 'score_move', lambda searched, move, depth: float(moves.index(move)))
+    _, best, score, _, played_scores, corrected = analysis.analyse((key, board, tuple(moves), {'depth': 2}))
+    assert best == moves[-1] and score == len(moves) - 1
+    assert corrected == (engine.Engine(1).think(board, depth=2)[-1][2] != moves[-1])
@@ -0,0 +1,23 @@
+import benchmark
+
+
+def test_compare_flags_only_slowdowns_beyond_tolerance():
+    baseline = {'tolerance': .2, 'results': {'fast': 1000, 'slow': 1000, 'new': None}}
+    results = {'fast': 1500, 'slow': 700, 'unknown': 1}
+    assert benchmark.compare(results, baseline) == [('slow', 700, 1000)]
+    assert benchmark.compare(results, baseline, tolerance=.5) == []
+    assert benchmark.compare({'slow': 810}, baseline) == []
+
+
+def test_baseline_round_trip(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    results = benchmark.measure(['get_legal_moves/s', 'draw_board frames/s'], rounds=1)
+    assert all(rate > 0 for rate in results.values())
+    benchmark.save_baseline(results, path, tolerance=.1)
+    saved = benchmark.load_baseline(path)
+    assert saved['results'] == results and saved['tolerance'] == .1
+    assert benchmark.compare(results, saved) == []
+
+
+def test_baseline_covers_every_benchmark():
+    assert set(benchmark.load_baseline()['results']) == set(benchmark.BENCHMARKS)
@@ -0,0 +1,198 @@
+import random
+from itertools import product
+
+import pytest
+import game
+import bitboard
+from bitboard import BitBoard
+
+
+def __make_occupy_consistent(board):
+    for row, col in product(range(game.BLEN), repeat=2):
+        occupied = any((row, col) in player.stones for player in (board.fst_player, board.snd_player))
+        board.occupied[row][col] = occupied
+
+
+def board_state(board):
+    players = (board.fst_player, board.snd_player)
+    return (board.turn_count, board.round_over, board.current_color,
+            players.index(board.current_player),
+            None if board.winner is None else players.index(board.winner),
+            [player.stones for player in players], [player.sumo_levels for player in players],
+            board.occupied)
+
+
+def legal_positions(bboard):
+    return [bitboard.to_pos(move) for move in bboard.get_legal_moves()]
+
+
+def assert_same_moves(board):
+    bboard = BitBoard.from_board(board)
+    assert legal_positions(bboard) == board.get_legal_moves()
+    for player, color in product((bitboard.FST, bitboard.SND), range(game.BLEN)):
+        bmoves = bboard.get_legal_moves(color, player)
+        assert bboard.has_legal_move(player, color) == bool(bboard.stone_moves(player, color))
+        previous_player = board.current_player
+        board.current_player = (board.fst_player, board.snd_player)[player]
+        assert [bitboard.to_pos(move) for move in bmoves] == board.get_legal_moves(color)
+        board.current_player = previous_player
+
+
+def sumo_board(fst_stones, snd_stones, fst_levels=None, snd_levels=None, color=0):
+    board = game.Board()
+    board.fst_player.stones = fst_stones
+    board.snd_player.stones = snd_stones
+    __make_occupy_consistent(board)
+    if fst_levels:
+        board.fst_player.sumo_levels = fst_levels
+    if snd_levels:
+        board.snd_player.sumo_levels = snd_levels
+    board.set_color(color)
+    return board
+
+
+def test_round_trip():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    board.perform_move((4, 5))
+    assert board_state(BitBoard.from_board(board).to_board()) == board_state(board)
+
+
+def test_get_legal_moves():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((6, 0))
+    assert set(legal_positions(BitBoard.from_board(board))) == {
+        (1, 2), (2, 2), (3, 2), (4, 2), (5, 2), (6, 2), (1, 1), (2, 0),
+        (1, 3), (2, 4), (3, 5), (4, 6), (5, 7)}
+
+
+def test_no_moves_before_color_is_set():
+    assert BitBoard().get_legal_moves() == []
+    assert BitBoard.from_board(game.Board()).get_legal_moves(color=0) == []
+
+
+@pytest.mark.parametrize('fst_stones, snd_stones, fst_levels, snd_levels, target', [
+    # own stone, off the board, same strength, weaker sumo, max push, single, double
+    ([(4, 4), (3, 4), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(0, 7), (0, 6), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [1] + [0] * 7, None, None),
+    ([(2, 7), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(0, 7), (1, 7), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [2] + [0] * 7, None, None),
+    ([(4, 3), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(3, 3), (0, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [1] + [0] * 7, [1] + [0] * 7, None),
+    ([(4, 3), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(3, 3), (0, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [2] + [0] * 7, [1] + [0] * 7, (3, 3)),
+    ([(4, 7), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(1, 7), (2, 7), (3, 7), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [3] + [0] * 7, None, (3, 7)),
+    ([(4, 4), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(3, 4), (0, 6), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [1] + [0] * 7, None, (3, 4)),
+    ([(4, 4), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)],
+     [(3, 4), (2, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)], [2] + [0] * 7, None, (3, 4)),
+])
+def test_sumo_pushes(fst_stones, snd_stones, fst_levels, snd_levels, target):
+    board = sumo_board(fst_stones, snd_stones, fst_levels, snd_levels)
+    assert_same_moves(board)
+    if target is None:
+        return
+    bboard = BitBoard.from_board(board)
+    before = board_state(bboard.to_board())
+    move_info = bboard.do_move(bitboard.to_square(target))
+    board.perform_move(target)
+    assert board_state(bboard.to_board()) == board_state(board)
+    bboard.undo_move(move_info)
+    assert board_state(bboard.to_board()) == before
+
+
+def test_puzzle_all_out():
+    board = sumo_board([(4, 0), (5, 0), (3, 0), (6, 3), (4, 4), (4, 6), (1, 6), (6, 7)],
+                       [(4, 5), (1, 5), (3, 5), (3, 1), (3, 3), (5, 2), (1, 0), (3, 2)], color=6)
+    board.current_player = board.snd_player
+    bboard = BitBoard.from_board(board)
+    assert set(legal_positions(bboard)) == {(2, 0), (2, 1)}
+    bboard.do_move(bitboard.to_square((2, 0)))
+    assert legal_positions(bboard) == [(4, 1)]
+    bboard.do_move(bitboard.to_square((4, 1)))
+    assert bboard.round_over
+    assert bboard.sumo_levels[bitboard.SND] == [0, 0, 1, 0, 0, 0, 0, 0]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_games_match_board(seed):
+    rng = random.Random(seed)
+    board = game.Board(winning_points=rng.randint(1, 15))
+    for _ in range(4):
+        board.set_color(rng.randrange(game.BLEN))
+        bboard = BitBoard.from_board(board)
+        history = []
+        while not board.round_over:
+            assert_same_moves(board)
+            target = rng.choice(board.get_legal_moves())
+            history.append((board_state(bboard.to_board()), bboard.do_move(bitboard.to_square(target))))
+            board.perform_move(target)
+            assert board_state(bboard.to_board()) == board_state(board)
+            assert bboard.hash == bboard.compute_hash()
+            assert bboard.mirror_hash == bboard.mirrored().hash == bboard.compute_hash(mirror=True)
+        for state, move_info in reversed(history):
+            bboard.undo_move(move_info)
+            assert board_state(bboard.to_board()) == state
+            assert bboard.hash == bboard.compute_hash()
+        if board.winner is not None:
+            break
+        board.reset(from_right=rng.random() < .5)
+
+
+def test_mirrored_position_shares_table_key():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    bboard = BitBoard.from_board(board)
+    mirrored = bboard.mirrored()
+    assert mirrored.current_player == bitboard.FST
+    assert mirrored.table_key()[0] == bboard.table_key()[0]
+    assert mirrored.table_key()[1] != bboard.table_key()[1]
+    assert sorted(mirrored.get_legal_moves()) == sorted(map(bitboard.mirror_square, bboard.get_legal_moves()))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_iter_moves_order(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    bboard = BitBoard.from_board(board)
+    while not bboard.round_over:
+        moves = bboard.get_legal_moves()
+        row = bboard.stones[bboard.current_player][bboard.current_color] >> 3
+        # longest first, the same order as the sort the engine used before
+        assert list(bboard.iter_moves()) == list(reversed(sorted(moves, key=lambda move: abs((move >> 3) - row))))
+        preferred = rng.choice(moves)
+        ordered = list(bboard.iter_moves((None, 0, preferred)))
+        assert sorted(ordered) == sorted(moves)
+        winning = [move for move in moves if bitboard.GOAL_MASKS[bboard.current_player] >> move & 1]
+        assert set(ordered[:len(winning)]) == set(winning)
+        if preferred not in winning:
+            assert ordered[len(winning)] == preferred
+        bboard.do_move(rng.choice(moves))
+    assert list(bboard.iter_moves()) == []
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_winning_threats_match_moves(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    bboard = BitBoard.from_board(board)
+    while not bboard.round_over:
+        for player in (bitboard.FST, bitboard.SND):
+            threats = 0
+            for color in range(game.BLEN):
+                can_win = any(bitboard.GOAL_MASKS[player] >> move & 1 for move in bboard.stone_moves(player, color))
+                assert bboard.has_winning_move(player, color) == can_win
+                threats |= can_win << color
+            assert bboard.winning_threats(player) == threats
+        bboard.do_move(rng.choice(bboard.get_legal_moves()))
+    assert not bboard.has_winning_move(bboard.current_player)
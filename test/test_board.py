@@ -1,4 +1,5 @@
 from itertools import product
+import random
 
 import pytest
 import game
@@ -272,3 +273,90 @@ def test_puzzle_all_out():
     board.perform_move((4, 1))
     assert board.round_over
     assert board.snd_player.sumo_levels == [0, 0, 1, 0, 0, 0, 0, 0]
+
+
+def test_get_stone_follows_moves_and_pushes():
+    board = game.Board()
+    board.fst_player.stones = [(4, 4), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)]
+    board.snd_player.stones = [(3, 4), (2, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)]
+    __make_occupy_consistent(board)
+
+    board.fst_player.sumo_levels[0] = 2
+    board.set_color(0)
+    assert board.get_stone((3, 4)) == (board.snd_player, 0)
+    board.perform_move((3, 4))
+
+    assert board.get_stone((3, 4)) == (board.fst_player, 0)
+    assert board.get_stone((2, 4)) == (board.snd_player, 0)
+    assert board.get_stone((1, 4)) == (board.snd_player, 1)
+    assert board.get_stone((4, 4)) is None
+
+
+def test_get_stone_miss_keeps_the_index():
+    board = game.Board()
+    index = board.stone_index
+    assert board.get_stone((4, 4)) is None
+    assert board.stone_index is index
+    board.fst_player.stones = [(4, 4)] + board.fst_player.stones[1:]
+    assert board.get_stone((4, 4)) == (board.fst_player, 0)
+    assert board.get_stone((7, 0)) is None
+
+
+
+def test_get_stone_finds_stones_set_in_place():
+    board = game.Board()
+    board.fst_player.stones[0] = (4, 4)
+    board.occupied[7][0], board.occupied[4][4] = False, True
+    assert board.get_stone((4, 4)) == (board.fst_player, 0)
+    assert board.get_stone((7, 0)) is None
+
+
+def __board_state(board):
+    return (board.current_color, board.current_player is board.fst_player, board.round_over,
+            board.winner is not None, board.turn_count,
+            tuple(board.fst_player.stones), tuple(board.snd_player.stones),
+            tuple(board.fst_player.sumo_levels), tuple(board.snd_player.sumo_levels),
+            tuple(map(tuple, board.occupied)))
+
+
+def test_classified_moves_of_sumo_board():
+    board = game.Board()
+    board.fst_player.stones = [(4, 4), (7, 1), (7, 2), (7, 3), (7, 4), (7, 5), (7, 6), (7, 7)]
+    board.snd_player.stones = [(3, 4), (2, 4), (0, 5), (0, 4), (0, 3), (0, 2), (0, 1), (0, 0)]
+    __make_occupy_consistent(board)
+    board.fst_player.sumo_levels[0] = 2
+    board.set_color(0)
+
+    moves = board.get_classified_moves()
+    assert [move[0] for move in moves] == board.get_legal_moves()
+    assert ((3, 4), game.SUMO_MOVE, 2) in moves
+    assert all(kind == game.NORMAL_MOVE for pos, kind, _ in moves if pos != (3, 4))
+    assert board.has_legal_move()
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_apply_move_matches_perform_move(seed):
+    rng = random.Random(seed)
+    board, checked = game.Board(), game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    checked.fst_player.sumo_levels = list(board.fst_player.sumo_levels)
+    checked.snd_player.sumo_levels = list(board.snd_player.sumo_levels)
+    color = rng.randrange(game.BLEN)
+    board.set_color(color)
+    checked.set_color(color)
+    history = []
+    while not board.round_over:
+        moves = board.get_classified_moves()
+        assert board.has_legal_move() == bool(moves)
+        move = rng.choice(moves)
+        before = __board_state(board)
+        history.append((before, board.apply_move(move)))
+        checked.perform_move(move[0])
+        assert __board_state(board) == __board_state(checked)
+        assert board.round_over == (move[1] == game.WINNING_MOVE or checked.round_over)
+    while history:
+        before, record = history.pop()
+        board.revert_move(record)
+        assert __board_state(board) == before
+    assert all(board.get_stone(pos)[0].stones[board.get_stone(pos)[1]] == pos for pos in board.stone_index)
@@ -0,0 +1,114 @@
+import multiprocessing
+
+import pytest
+import game
+import engine
+import disk_cache
+from disk_cache import DiskCache, HEADER_BYTES, SLOT
+from transposition import EXACT, LOWER, UPPER
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'engine.cache')
+
+
+@pytest.fixture
+def opening_board():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    board.perform_move((4, 5))
+    return board
+
+
+def store_entries(path, entries):
+    with DiskCache(path, megabytes=1) as cache:
+        for entry in entries:
+            cache.store(*entry)
+
+
+def test_entries_survive_reopening(cache_path):
+    with DiskCache(cache_path, megabytes=1) as cache:
+        cache.store(12345, 5, LOWER, -3.125, 17)
+        cache.store(678, 2, EXACT, engine.Engine.INF, None)
+        cache.store(91011, 7, UPPER, -engine.Engine.END_SCORE + 4, 0)
+        assert cache.probe(12345) == (5, LOWER, -3.125, 17)
+        assert cache.probe(4242) is None
+    with DiskCache(cache_path, readonly=True) as cache:
+        assert cache.probe(12345) == (5, LOWER, -3.125, 17)
+        assert cache.probe(678) == (2, EXACT, engine.Engine.INF, None)
+        assert cache.probe(91011) == (7, UPPER, -engine.Engine.END_SCORE + 4, 0)
+        assert sorted(entry[0] for entry in cache.entries()) == [678, 12345, 91011]
+
+
+def test_size_cap_and_replacement(cache_path):
+    with DiskCache(cache_path, megabytes=1) as cache:
+        assert HEADER_BYTES + cache.size * SLOT.size <= 2 ** 20
+        colliding = 5 + cache.size
+        cache.store(5, 6, EXACT, 1, 3)
+        cache.store(colliding, 4, EXACT, 2, 3)
+        assert cache.probe(5) == (6, EXACT, 1, 3)
+        assert cache.probe(colliding) is None
+        cache.store(5, 2, LOWER, 1.5, 4)
+        assert cache.probe(5) == (2, LOWER, 1.5, 4)
+        cache.store(colliding, 2, EXACT, 2, 3)
+        assert cache.probe(colliding) == (2, EXACT, 2, 3)
+    # the size is fixed when the file is created
+    with DiskCache(cache_path, megabytes=64) as cache:
+        assert HEADER_BYTES + cache.size * SLOT.size <= 2 ** 20
+
+
+def test_torn_slot_reads_as_miss(cache_path):
+    store_entries(cache_path, [(77, 5, EXACT, 1, 3)])
+    with DiskCache(cache_path) as cache:
+        offset = HEADER_BYTES + (77 & cache.mask) * SLOT.size
+        check, data = SLOT.unpack_from(cache.map, offset)
+        SLOT.pack_into(cache.map, offset, check, data ^ 1 << 40)
+        assert cache.probe(77) is None
+        cache.store(77, 5, EXACT, 0, None)
+        assert cache.probe(77) == (5, EXACT, 0, None)
+
+
+def test_rejects_other_files(cache_path):
+    with open(cache_path, 'wb') as file:
+        file.write(b'not a cache' * 10)
+    with pytest.raises(ValueError):
+        DiskCache(cache_path)
+
+
+def test_compact_keeps_deep_entries(cache_path, capsys):
+    store_entries(cache_path, [(key, key % 8, EXACT, key / 8, None) for key in range(1, 200)])
+    disk_cache.compact(cache_path, None, 1, 4)
+    with DiskCache(cache_path, readonly=True) as cache:
+        assert sorted(entry[0] for entry in cache.entries()) == [key for key in range(1, 200) if key % 8 >= 4]
+    disk_cache.inspect(cache_path)
+    assert 'depth   7: 25' in capsys.readouterr().out
+
+
+def search_with_cache(path, board):
+    with DiskCache(path) as cache:
+        bot = engine.Engine(disk_cache=cache)
+        move, _ = bot.get_move(board, depth=6)
+        return move, bot.nodes, cache.hits
+
+
+def test_engines_warm_each_other_up(cache_path, opening_board):
+    cold_move, cold_nodes, _ = search_with_cache(cache_path, opening_board)
+    with multiprocessing.Pool(2) as pool:
+        results = pool.starmap(search_with_cache, [(cache_path, opening_board)] * 2)
+    for move, nodes, hits in results:
+        assert hits > 0
+        assert nodes < cold_nodes
+    assert engine.Engine().get_move(opening_board, depth=6)[0] == cold_move
+
+
+def test_readonly_cache_serves_an_engine(cache_path, opening_board):
+    cold_move, _, _ = search_with_cache(cache_path, opening_board)
+    with DiskCache(cache_path, readonly=True) as cache:
+        before = list(cache.entries())
+        bot = engine.Engine(disk_cache=cache)
+        assert bot.get_move(opening_board, depth=6)[0] == cold_move
+        assert cache.hits > 0 and cache.stores == 0
+    with DiskCache(cache_path, readonly=True) as cache:
+        assert list(cache.entries()) == before
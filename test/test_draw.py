@@ -0,0 +1,37 @@
+import random
+
+import pytest
+from PIL import ImageChops
+import game
+import draw
+
+
+def random_board(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 1, 2, 3, 4)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    for _ in range(rng.randrange(12)):
+        moves = board.get_legal_moves()
+        if board.round_over or not moves:
+            break
+        board.perform_move(rng.choice(moves))
+    return board
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_cached_cells_match_uncached_drawing(seed):
+    board = random_board(seed)
+    assert ImageChops.difference(draw.draw_board(board), draw.draw_board_uncached(board)).getbbox() is None
+
+
+def test_cell_keys():
+    board = game.Board()
+    board.set_color(0)
+    keys = draw.cell_keys(board)
+    assert len(keys) == 64
+    assert keys[63] == (game.Board.get_board_color((7, 7)), ('White', 7, 0), None)
+    assert keys[7 * 8] == (game.Board.get_board_color((7, 0)), ('White', 0, 0), None)
+    assert sum(marker is not None for _, _, marker in keys) == len(board.get_legal_moves())
+    assert draw.cell_image(keys[0]) is draw.cell_image(keys[0])
@@ -0,0 +1,202 @@
+import io
+import json
+import random
+import threading
+import time
+
+import pytest
+import game
+import engine
+from bitboard import BitBoard, to_pos
+from search_stats import SearchStats
+
+
+@pytest.fixture
+def opening_board():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    board.perform_move((4, 5))
+    return board
+
+
+def depth_of(debug):
+    return int(next(line for line in debug if line.startswith('to a depth of')).split()[-1])
+
+
+def test_needs_a_limit(opening_board):
+    with pytest.raises(ValueError):
+        engine.Engine().get_move(opening_board)
+
+
+@pytest.mark.parametrize('depth', [0, -1])
+def test_needs_a_positive_depth(opening_board, depth):
+    with pytest.raises(ValueError):
+        engine.Engine().get_move(opening_board, depth=depth)
+
+
+def test_fixed_depth_is_reproducible(opening_board):
+    first_move, first_debug = engine.Engine().get_move(opening_board, depth=3)
+    second_move, second_debug = engine.Engine().get_move(opening_board, depth=3)
+    assert first_move == second_move
+    assert depth_of(first_debug) == 3
+    assert first_debug == second_debug
+
+
+def test_node_limit_is_reproducible(opening_board):
+    bot = engine.Engine()
+    move, debug = bot.get_move(opening_board, node_limit=2000)
+    assert bot.nodes == 2000
+    assert (move, debug) == engine.Engine().get_move(opening_board, node_limit=2000)
+
+
+def test_aborted_iteration_falls_back_to_completed_depth(opening_board):
+    bot = engine.Engine()
+    move, debug = bot.get_move(opening_board, node_limit=2000)
+    completed = depth_of(debug)
+    assert bot.current_depth == completed + 1
+    assert move == engine.Engine().get_move(opening_board, depth=completed)[0]
+
+
+def test_deadline_interrupts_iteration(opening_board):
+    bot = engine.Engine()
+    start = time.time()
+    iterations = bot.think(BitBoard.from_board(opening_board), time_to_calc=200)
+    # without the deadline the search would go on to the maximum depth, the bound is loose for busy machines
+    assert time.time() - start < 5
+    assert iterations[-1][0] + 1 < bot.max_depth
+    assert bot.current_depth == iterations[-1][0] + 1
+
+
+def test_aborted_search_leaves_the_board(opening_board):
+    bboard = BitBoard.from_board(opening_board)
+    state = bboard.hash, [list(stones) for stones in bboard.stones], bboard.current_player, bboard.current_color
+    bot = engine.Engine()
+    first = bot.think(bboard, node_limit=3000)
+    assert bot.nodes == 3000
+    assert (bboard.hash, bboard.stones, bboard.current_player, bboard.current_color) == state
+    assert not bboard.round_over
+    assert bot.think(bboard, depth=2)[-1][2] in bboard.get_legal_moves()
+    assert first[-1][2] in bboard.get_legal_moves()
+
+
+def test_search_stats_stream(opening_board):
+    stream = io.StringIO()
+    bot = engine.Engine(stats=SearchStats(stream=stream))
+    move, debug = bot.get_move(opening_board, depth=4)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['depth'] for record in records] == [1, 2, 3, 4]
+    assert sum(record['nodes'] for record in records) == bot.nodes
+    assert sum(record['evaluations'] for record in records) == bot.positions_evaluated
+    assert all(record['nodes'] == sum(record['nodes_per_ply']) for record in records)
+    assert tuple(records[-1]['move']) == move
+    assert bot.stats.effective_branching_factor() > 1
+    assert (move, debug) == engine.Engine().get_move(opening_board, depth=4)
+
+
+def test_search_stats_restart_with_every_search(opening_board):
+    stream = io.StringIO()
+    bot = engine.Engine(stats=SearchStats(stream=stream))
+    bot.get_move(opening_board, depth=3)
+    bot.get_move(opening_board, depth=2)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['depth'] for record in records] == [1, 2, 3, 1, 2]
+    assert records[3]['branching'] is None
+    assert [record['depth'] for record in bot.stats.iterations] == [1, 2]
+    assert sum(record['nodes'] for record in bot.stats.iterations) == bot.nodes
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_move_ordering_keeps_scores(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    board.set_color(rng.randrange(game.BLEN))
+    for _ in range(rng.randrange(6)):
+        board.perform_move(rng.choice(board.get_legal_moves()))
+    bboard = BitBoard.from_board(board)
+    ordered = engine.Engine().think(bboard, depth=5)
+    plain = engine.Engine(move_ordering=False).think(bboard, depth=5)
+    assert [score for _, score, _ in ordered] == [score for _, score, _ in plain]
+
+
+def test_principal_variation_is_legal(opening_board):
+    bot = engine.Engine()
+    move, debug = bot.get_move(opening_board, depth=5)
+    assert any(line.endswith('first-move cutoffs') for line in debug)
+    bboard = BitBoard.from_board(opening_board)
+    assert to_pos(bot.pv_line[0]) == move
+    for pv_move in bot.pv_line:
+        assert pv_move in bboard.get_legal_moves()
+        bboard.do_move(pv_move)
+
+
+def crowded_board(seed):
+    """Random position after some moves with sumos around, so that skips and deadlocks occur in the search."""
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    for _ in range(rng.randrange(4, 20)):
+        moves = board.get_legal_moves()
+        if board.round_over or len(moves) == 1:
+            break
+        board.perform_move(rng.choice(moves))
+    return board
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_pvs_and_aspiration_keep_scores(seed):
+    bboard = BitBoard.from_board(crowded_board(seed))
+    if bboard.round_over:
+        return
+    plain = [score for _, score, _ in engine.Engine(pvs=False, aspiration=False).think(bboard, depth=5)]
+    assert [score for _, score, _ in engine.Engine().think(bboard, depth=5)] == plain
+    assert [score for _, score, _ in engine.Engine(aspiration=False).think(bboard, depth=5)] == plain
+    narrow = engine.Engine()
+    narrow.aspiration_window = engine.Engine.SCORE_STEP
+    assert [score for _, score, _ in narrow.think(bboard, depth=5)] == plain
+
+
+def test_root_cutoff_keeps_the_move():
+    # a move skipping the opponent into a certain win scores INF and cuts off at the root
+    bboard = BitBoard.from_board(crowded_board(18))
+    depth, score, move = engine.Engine().think(bboard, depth=1)[-1]
+    assert score == engine.Engine.INF
+    assert move in bboard.get_legal_moves()
+
+
+def test_stop_returns_the_last_completed_depth(opening_board):
+    bot = engine.Engine()
+    bot.stop()
+    iterations = bot.think(BitBoard.from_board(opening_board), time_to_calc=60 * 1000)
+    assert [depth for depth, _, _ in iterations] == [1]
+    assert not bot.stop_requested
+    timer = threading.Timer(.3, bot.stop)
+    timer.start()
+    start = time.time()
+    iterations = bot.think(BitBoard.from_board(opening_board), time_to_calc=60 * 1000)
+    assert time.time() - start < 5
+    assert iterations[-1][2] in BitBoard.from_board(opening_board).get_legal_moves()
+
+
+def test_reset_limits_drops_a_pending_stop(opening_board):
+    bot = engine.Engine()
+    bot.stop()
+    bot.ponder_hit(1)
+    bot.reset_limits()
+    assert [depth for depth, _, _ in bot.think(BitBoard.from_board(opening_board), depth=3)] == [1, 2, 3]
+
+
+def test_ponder_search_runs_until_ponder_hit(opening_board):
+    bot = engine.Engine()
+    with pytest.raises(ValueError):
+        bot.think(BitBoard.from_board(opening_board))
+    timer = threading.Timer(.3, bot.ponder_hit, (400,))
+    timer.start()
+    start = time.time()
+    iterations = bot.think(BitBoard.from_board(opening_board), ponder=True)
+    # the time budget counts from the start of pondering
+    assert .3 < time.time() - start < 5
+    assert iterations[-1][2] in BitBoard.from_board(opening_board).get_legal_moves()
+    assert bot.ponder_time is None
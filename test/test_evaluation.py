@@ -0,0 +1,110 @@
+import random
+from itertools import product
+
+import pytest
+import game
+import engine
+import batch_eval
+from bitboard import BitBoard, to_pos, to_square
+
+
+def other_player(board, player):
+    return board.snd_player if player == board.fst_player else board.fst_player
+
+
+def reference_score(board: game.Board):
+    """Evaluation as it was computed on game.Board before the incremental features."""
+    def legal_moves(player, color=None):
+        previous_player = board.current_player
+        board.current_player = player
+        moves = board.get_legal_moves(color)
+        board.current_player = previous_player
+        return moves
+
+    def has_winning_move(player, color=None):
+        return any(move[0] == other_player(board, player).start_row for move in legal_moves(player, color))
+
+    def winning_stone_count(player):
+        return len(list(filter(lambda color: has_winning_move(player, color), range(8))))
+
+    def avg_color_diversity(player):
+        return sum(len({game.Board.get_board_color(move) for move in legal_moves(player, color)})
+                   for color in range(8)) / 8
+
+    player, other = board.current_player, other_player(board, board.current_player)
+    if has_winning_move(player):
+        return engine.Engine.INF
+    return (winning_stone_count(player) - winning_stone_count(other)
+            + avg_color_diversity(player) - avg_color_diversity(other))
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_incremental_score_matches_reference(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    bboard = BitBoard.from_board(board)
+    bot = engine.Engine()
+    history = []
+    for _ in range(300):
+        assert bot.score_position(bboard) == reference_score(bboard.to_board())
+        moves = bboard.get_legal_moves()
+        if history and (not moves or rng.random() < .4):
+            bboard.undo_move(history.pop())
+            continue
+        if not moves:
+            break
+        history.append(bboard.do_move(rng.choice(moves)))
+    while history:
+        bboard.undo_move(history.pop())
+        assert bot.score_position(bboard) == reference_score(bboard.to_board())
+    fresh = BitBoard.from_board(board)
+    for player, color in product((0, 1), range(game.BLEN)):
+        if bboard.features[player][color] is not None:
+            assert bboard.features[player][color] == fresh.stone_features(player, color)
+
+
+def test_features_follow_moves():
+    board = game.Board()
+    board.set_color(0)
+    bboard = BitBoard.from_board(board)
+    reach, can_win, colors = bboard.stone_features(0, 4)
+    untouched = bboard.stone_features(0, 1)
+    assert not can_win
+    assert {to_pos(square) for square in range(64) if reach >> square & 1} == set(board.get_legal_moves(4))
+    move_info = bboard.do_move(to_square((5, 2)))
+    assert bboard.features[0][4] is None
+    assert bboard.features[0][1] == untouched
+    bboard.undo_move(move_info)
+    assert bboard.features[0][4] == (reach, can_win, colors)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_batch_matches_score_position(seed):
+    rng = random.Random(seed)
+    board = game.Board()
+    for player in (board.fst_player, board.snd_player):
+        player.sumo_levels = [rng.choice((0, 0, 0, 1, 2, 3)) for _ in range(game.BLEN)]
+    board.set_color(rng.randrange(game.BLEN))
+    bboard = BitBoard.from_board(board)
+    bot = engine.Engine()
+    rows, expected = [batch_eval.encode(BitBoard())], [0]
+    while not bboard.round_over:
+        rows.append(batch_eval.encode(bboard))
+        expected.append(bot.score_position(bboard))
+        bboard.do_move(rng.choice(bboard.get_legal_moves()))
+    rows.append(batch_eval.encode(bboard))
+    expected.append(bot.score_position(bboard))
+    assert batch_eval.evaluate(batch_eval.PositionBatch(rows)).tolist() == expected
+
+
+def test_batch_leaves_keep_search_results():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    board.perform_move((4, 5))
+    for depth in (1, 2, 5):
+        plain = engine.Engine().think(BitBoard.from_board(board), depth=depth)
+        assert engine.Engine(batch_leaves=True).think(BitBoard.from_board(board), depth=depth) == plain
@@ -0,0 +1,104 @@
+import io
+import random
+
+import pytest
+import game
+import game_record
+import tournament
+from game_record import FILE_HEADER, GAME_HEADER, RecordingBoard, RecordReader, RecordWriter
+
+
+def board_state(board):
+    return (board.current_color, board.current_player is board.fst_player, board.round_over,
+            None if board.winner is None else board.winner is board.fst_player, board.turn_count,
+            tuple(board.fst_player.stones), tuple(board.snd_player.stones),
+            tuple(board.fst_player.sumo_levels), tuple(board.snd_player.sumo_levels),
+            tuple(map(tuple, board.occupied)))
+
+
+def random_match(seed):
+    """A randomly played match with its board state after every event."""
+    rng = random.Random(seed)
+    recorder = RecordingBoard(game.Board(rng.randrange(1, 4)))
+    board = recorder.board
+    states = []
+    while board.winner is None:
+        if board.round_over:
+            recorder.reset(rng.random() < .5)
+            states.append(board_state(board))
+        recorder.set_color(rng.randrange(game.BLEN))
+        states.append(board_state(board))
+        while not board.round_over:
+            recorder.perform_move(rng.choice(board.get_legal_moves()))
+            states.append(board_state(board))
+    return recorder.record(seed, {'seed': seed} if seed % 2 else None), states
+
+
+def test_round_trip_replays_identical_boards(tmp_path):
+    path = str(tmp_path / 'games.kmgr')
+    matches = [random_match(seed) for seed in range(12)]
+    with RecordWriter(path) as writer:
+        for record, _ in matches[:5]:
+            writer.write(record)
+    with RecordWriter(path) as writer:
+        for record, _ in matches[5:]:
+            writer.write(record)
+    with RecordReader(path) as reader:
+        records = list(reader)
+    assert records == [record for record, _ in matches]
+    for record, (_, states) in zip(records, matches):
+        assert [board_state(board) for board in game_record.replay(record)] == states
+        assert board_state(game_record.final_board(record)) == states[-1]
+        assert record.winner == (game_record.FST_WINNER if states[-1][3] else game_record.SND_WINNER)
+
+
+def test_compact_size(tmp_path):
+    path = str(tmp_path / 'games.kmgr')
+    record, _ = random_match(0)
+    with RecordWriter(path) as writer:
+        writer.write(record)
+    assert (tmp_path / 'games.kmgr').stat().st_size \
+        == game_record.FILE_HEADER.size + game_record.GAME_HEADER.size + len(record.events)
+    assert len(record.events) < 1.5 * record.moves()
+
+
+def test_rejects_other_and_cut_off_files(tmp_path):
+    path = tmp_path / 'games.kmgr'
+    path.write_bytes(b'no records')
+    with pytest.raises(ValueError):
+        RecordReader(str(path))
+    record, _ = random_match(3)
+    path.unlink()
+    with RecordWriter(str(path)) as writer:
+        writer.write(record)
+    data = path.read_bytes()
+    path.write_bytes(data[:-1])
+    with RecordReader(str(path)) as reader, pytest.raises(ValueError):
+        list(reader)
+    # inside the header of a second game
+    path.write_bytes(data + data[FILE_HEADER.size:FILE_HEADER.size + GAME_HEADER.size - 3])
+    with RecordReader(str(path)) as reader, pytest.raises(ValueError, match='header'):
+        list(reader)
+
+
+def test_tournament_matches_convert_both_ways(tmp_path):
+    path = str(tmp_path / 'games.kmgr')
+    summary = tournament.run(2, ({}, {}), {'depth': 1}, winning_points=2, workers=1, stream=io.StringIO(),
+                             record_path=path)
+    assert summary['wins']['A'] + summary['wins']['B'] == 2
+    matches = {match['game']: match for match in game_record.read_matches(path)}
+    assert sorted(matches) == [0, 1]
+    match = tournament.play_match((0, ({}, {}), True, {'depth': 1}, 2, 0))
+    record = game_record.from_match(match)
+    assert matches[0]['rounds'] == game_record.to_match(record)['rounds']
+    for round_record in match['rounds']:
+        round_record['moves'] = [tuple(move) for move in round_record['moves']]
+        for key in ('scores', 'nodes', 'ms', 'winner'):
+            del round_record[key]
+    assert game_record.to_match(record)['rounds'] == match['rounds']
+    board = game_record.final_board(record)
+    assert board.fst_player.get_points() == match['points']['A']
+    text = game_record.to_text(record)
+    assert text.splitlines()[0] == f'game 0, 2 points to win, winner {"White" if match["winner"] == "A" else "Black"} ' \
+                                   '{"white": "A"}'
+    assert len(text.splitlines()) == len(record.events) + 1
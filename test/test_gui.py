@@ -0,0 +1,113 @@
+import time
+
+import pygame
+import pytest
+import game
+import engine
+import draw
+import gui
+
+
+def wait_for_result(search):
+    for _ in range(1000):
+        result = search.result()
+        if result is not None or not search.running():
+            return result
+        time.sleep(.01)
+    raise AssertionError('search did not finish')
+
+
+def opening_board():
+    board = game.Board()
+    board.set_color(0)
+    board.perform_move((5, 0))
+    return board
+
+
+def test_bot_search_runs_in_the_background():
+    board = opening_board()
+    search = gui.BotSearch(engine.Engine(), 60 * 1000)
+    search.start(board)
+    assert search.running()
+    assert search.result() is None
+    assert search.progress()[0] == 'thinking...'
+    time.sleep(.2)
+    search.force_move()
+    move, debug = wait_for_result(search)
+    assert move in board.get_legal_moves()
+    assert not search.running()
+    # the search works on a copy
+    assert board.turn_count == 1
+
+
+def test_cancelled_bot_search_has_no_move():
+    search = gui.BotSearch(engine.Engine(), 60 * 1000)
+    search.start(opening_board())
+    search.cancel()
+    assert not search.running()
+    assert search.result() is None
+    search.start(opening_board())
+    search.force_move()
+    assert wait_for_result(search) is not None
+
+
+def bot_move_and_ponder(search):
+    board = opening_board()
+    search.start(board)
+    move, _ = wait_for_result(search)
+    board.perform_move(move)
+    search.ponder(board)
+    return board
+
+
+@pytest.fixture
+def ponder_search():
+    search = gui.BotSearch(engine.Engine(), 300, ponder=True)
+    yield search
+    search.cancel()
+
+
+def test_ponder_hit_answers_with_head_start(ponder_search):
+    search = ponder_search
+    board = bot_move_and_ponder(search)
+    assert search.pondering() and not search.running()
+    predicted = search.predicted_move
+    time.sleep(.4)
+    board.perform_move(predicted)
+    pondering_thread = search.thread
+    search.start(board)
+    # the pondering search goes on as the move search instead of a new one
+    assert search.running() and search.thread is pondering_thread
+    move, debug = wait_for_result(search)
+    assert move in board.get_legal_moves()
+    assert debug[-1] == 'ponder hits: 100%'
+
+
+def test_ponder_miss_searches_the_real_position(ponder_search):
+    search = ponder_search
+    board = bot_move_and_ponder(search)
+    predicted = search.predicted_move
+    board.perform_move(next(move for move in board.get_legal_moves() if move != predicted))
+    if board.round_over:
+        return
+    search.start(board)
+    move, debug = wait_for_result(search)
+    assert move in board.get_legal_moves()
+    assert (search.ponder_hits, search.ponder_misses) == (0, 1)
+    assert debug[-1] == 'ponder hits: 0%'
+
+
+def test_board_view_only_draws_changed_cells():
+    surface = pygame.Surface((gui.BOARD_PIXELS, ) * 2)
+    view = gui.BoardView(surface)
+    board = opening_board()
+    assert len(view.draw(board)) == 64
+    assert view.draw(board) == []
+    before = draw.cell_keys(board)
+    board.perform_move(board.get_legal_moves()[0])
+    changed = sum(old != new for old, new in zip(before, draw.cell_keys(board)))
+    assert 0 < len(view.draw(board)) == changed < 64
+    image = draw.draw_board(board)
+    assert pygame.image.tobytes(surface, 'RGB') == image.tobytes()
+    view.invalidate()
+    assert len(view.draw(board)) == 64
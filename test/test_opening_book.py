@@ -0,0 +1,57 @@
+import pytest
+import game
+import engine
+import opening_book
+from bitboard import BitBoard, to_pos
+from opening_book import OpeningBook
+
+
+@pytest.fixture(scope='module')
+def book():
+    return opening_book.build(plies=1, depth=3, workers=2)
+
+
+def test_opening_positions():
+    positions = opening_book.opening_positions(1)
+    assert len(opening_book.opening_positions(0)) == game.BLEN
+    assert len({board.table_key()[0] for board in positions}) == len(positions)
+    first_moves = sum(len(opening_book.start_position(color).get_legal_moves()) for color in range(game.BLEN))
+    assert game.BLEN < len(positions) <= game.BLEN + first_moves
+
+
+def test_book_moves_match_search(book):
+    for board in opening_book.opening_positions(1):
+        move, depth, score = book.lookup(board)
+        assert depth == 3
+        assert (depth, score, move) == engine.Engine().think(board, depth=3)[-1]
+
+
+def test_save_and_load(book, tmp_path):
+    path = str(tmp_path / 'opening.book')
+    book.save(path)
+    assert OpeningBook.load(path).entries == book.entries
+    with open(path, 'r+b') as file:
+        file.truncate(20)
+    with pytest.raises(ValueError):
+        OpeningBook.load(path)
+
+
+def test_get_move_uses_book(book):
+    board = game.Board()
+    board.set_color(3)
+    bot = engine.Engine(book=book)
+    move, debug = bot.get_move(board, 10 ** 6)
+    assert debug[-1] == 'book move'
+    assert bot.nodes == 0
+    assert move == to_pos(book.lookup(BitBoard.from_board(board))[0])
+    bot.use_book = False
+    assert bot.get_move(board, depth=2)[1][-1] != 'book move'
+    board.perform_move(move)
+    board.perform_move(board.get_legal_moves()[0])
+    assert engine.Engine(book=book).get_move(board, depth=2)[1][-1] != 'book move'
+
+
+def test_mirrored_position_finds_entry(book):
+    board = opening_book.start_position(5)
+    move, depth, score = book.lookup(board)
+    assert book.lookup(board.mirrored()) == (63 - move, depth, score)
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+import game
+import engine
+import parallel
+
+
+@pytest.fixture(scope='module')
+def parallel_engine():
+    bot = parallel.ParallelEngine(workers=3)
+    yield bot
+    bot.close()
+
+
+@pytest.mark.parametrize('color, moves', [(0, [(5, 0), (4, 5)]), (3, [(3, 3), (4, 0)]), (6, [])])
+def test_parallel_score_matches_single_process(parallel_engine, color, moves):
+    board = game.Board()
+    board.set_color(color)
+    for move in moves:
+        board.perform_move(move)
+    move, debug = parallel_engine.get_move(board, depth=3)
+    single_move, single_debug = engine.Engine().get_move(board, depth=3)
+    assert debug[:1] + debug[2:3] == single_debug[:1] + single_debug[2:3]
+    assert move in board.get_legal_moves()
+
+
+def test_node_limit_is_split_between_workers(parallel_engine):
+    board = game.Board()
+    board.set_color(2)
+    parallel_engine.get_move(board, node_limit=3000)
+    assert parallel_engine.nodes <= 3000
+
+
+def test_no_move_raises_like_engine(parallel_engine):
+    board = game.Board()
+    board.set_color(3)
+    while not board.round_over:
+        board.perform_move(board.get_legal_moves()[0])
+    for bot in (parallel_engine, engine.Engine()):
+        with pytest.raises(game.GameException):
+            bot.get_move(board, node_limit=3000)
+
+
+def test_ponder_stops_like_engine(parallel_engine):
+    board = game.Board()
+    board.set_color(4)
+    timer = threading.Timer(.3, parallel_engine.stop)
+    timer.start()
+    move, _ = parallel_engine.get_move(board, ponder=True)
+    timer.join()
+    assert move in board.get_legal_moves()
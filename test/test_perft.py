@@ -0,0 +1,44 @@
+import pytest
+import perft
+
+# (nodes, wins, sumos, skips, deadlocks) per depth, the reference counts the first three depths
+GOLDEN = {
+    'start': [(12, 0, 0, 0, 0), (127, 0, 0, 2, 0), (1364, 5, 0, 30, 0), (12971, 143, 0, 324, 3),
+              (113196, 2054, 0, 2319, 38)],
+    'opening': [(8, 0, 0, 0, 0), (63, 2, 0, 0, 0), (466, 22, 0, 7, 0), (3431, 145, 0, 25, 0),
+                (24330, 1112, 0, 362, 7)],
+    'sumos': [(7, 0, 1, 0, 0), (33, 0, 0, 0, 0), (320, 10, 0, 0, 0), (1878, 18, 0, 7, 0),
+              (15133, 866, 27, 88, 0)],
+    'puzzle': [(2, 0, 0, 0, 0), (5, 1, 0, 1, 1), (12, 6, 0, 1, 0), (36, 7, 0, 4, 0), (141, 38, 0, 10, 0)],
+}
+REFERENCE_DEPTH = 3
+
+
+def expected(name, depth):
+    return dict(zip(perft.EVENTS, GOLDEN[name][depth - 1]))
+
+
+@pytest.mark.parametrize('name', list(GOLDEN))
+@pytest.mark.parametrize('backend', list(perft.BACKENDS))
+def test_golden_counts(name, backend):
+    board = perft.POSITIONS[name]()
+    last_depth = REFERENCE_DEPTH if backend == 'reference' else len(GOLDEN[name])
+    for depth in range(1, last_depth + 1):
+        assert perft.perft(board, depth, backend) == expected(name, depth)
+        assert perft.perft(board, depth, backend, bulk=True) == {'nodes': expected(name, depth)['nodes']}
+
+
+def test_perft_leaves_the_board_unchanged():
+    board = perft.POSITIONS['sumos']()
+    before = perft.perft(board, 2, 'reference')
+    for backend in perft.BACKENDS:
+        perft.perft(board, 3, backend)
+    assert perft.perft(board, 2, 'reference') == before
+    assert perft.perft(board, 0) == {'nodes': 1}
+
+
+def test_run_reports_agreement(capsys):
+    assert perft.run(['puzzle'], [1, 2], list(perft.BACKENDS), bulk=False)
+    output = capsys.readouterr().out
+    assert 'MISMATCH' not in output
+    assert 'deadlocks 1' in output
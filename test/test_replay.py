@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageChops
+import game
+import draw
+import replay
+import tournament
+
+
+@pytest.fixture(scope='module')
+def match():
+    return tournament.play_match((0, ({}, {}), True, {'depth': 1}, 2, 5))
+
+
+def replayed_images(match):
+    board = game.Board(match['winning_points'])
+    for record in match['rounds']:
+        board.set_color(record['color'])
+        yield draw.draw_board(board)
+        for move in record['moves']:
+            board.perform_move(tuple(move))
+            yield draw.draw_board(board)
+        if 'from_right' in record:
+            board.reset(from_right=record['from_right'])
+
+
+def same_image(first, second):
+    return ImageChops.difference(first.convert('RGB'), second.convert('RGB')).getbbox() is None
+
+
+def test_gif_frames_match_draw_board(match, tmp_path):
+    path = str(tmp_path / 'game.gif')
+    count = replay.export(match, path, 'gif')
+    assert count == sum(len(record['moves']) + 1 for record in match['rounds'])
+    with Image.open(path) as gif:
+        assert gif.n_frames == count
+        for index, expected in enumerate(replayed_images(match)):
+            gif.seek(index)
+            assert same_image(gif, expected)
+
+
+def test_png_frames_rendered_in_parallel(match, tmp_path):
+    output = str(tmp_path / 'frames')
+    replay.BATCH_FRAMES, batch_frames = 3, replay.BATCH_FRAMES
+    try:
+        with multiprocessing.Pool(2) as pool:
+            count = replay.export(match, output, 'png', pool, workers=2)
+    finally:
+        replay.BATCH_FRAMES = batch_frames
+    assert sorted(os.listdir(output)) == [f'frame_{index:04d}.png' for index in range(count)]
+    for index, expected in enumerate(replayed_images(match)):
+        with Image.open(os.path.join(output, f'frame_{index:04d}.png')) as frame:
+            assert same_image(frame, expected)
+
+
+def test_peak_memory_without_resource(monkeypatch):
+    own, children = replay.peak_memory_megabytes()
+    assert 1 < own < 10000 and children >= 0
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    assert replay.peak_memory_megabytes() is None
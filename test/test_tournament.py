@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+import game
+import game_record
+import tournament
+
+
+def test_wilson_interval():
+    assert tournament.wilson_interval(0, 0) == (0, 1)
+    low, high = tournament.wilson_interval(5, 10)
+    assert low < .5 < high
+    assert abs(low + high - 1) < 1e-9
+    low, high = tournament.wilson_interval(10, 10)
+    assert 0.6 < low < 1 and abs(high - 1) < 1e-9
+    assert tournament.wilson_interval(60, 100)[1] - tournament.wilson_interval(60, 100)[0] \
+        < tournament.wilson_interval(6, 10)[1] - tournament.wilson_interval(6, 10)[0]
+
+
+def test_match_record_replays():
+    result = tournament.play_match((3, ({}, {'pvs': False}), False, {'depth': 1}, 3, 42))
+    assert result['game'] == 3 and result['white'] == 'B'
+    names = {True: 'B', False: 'A'}
+    board = game.Board(3)
+    for number, record in enumerate(result['rounds']):
+        assert len(record['moves']) == len(record['scores']) == len(record['nodes']) == len(record['ms'])
+        board.set_color(record['color'])
+        for move in record['moves']:
+            board.perform_move(tuple(move))
+        assert board.round_over
+        assert record['winner'] == names[board.current_player == board.fst_player]
+        if number < len(result['rounds']) - 1:
+            board.reset(from_right=record['from_right'])
+    assert board.winner is not None
+    assert result['winner'] == names[board.winner == board.fst_player]
+    assert result['points'] == {'B': board.fst_player.get_points(), 'A': board.snd_player.get_points()}
+    assert max(result['points'].values()) >= 3
+
+
+def test_run_streams_json_lines():
+    stream = io.StringIO()
+    summary = tournament.run(4, ({}, {}), {'depth': 1}, winning_points=1, workers=2, seed=7, stream=stream)
+    results = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert sorted(result['game'] for result in results) == [0, 1, 2, 3]
+    assert [result['white'] for result in sorted(results, key=lambda result: result['game'])] == ['A', 'B', 'A', 'B']
+    assert summary['wins']['A'] + summary['wins']['B'] == 4
+    assert summary['wins']['A'] == sum(result['winner'] == 'A' for result in results)
+    assert summary['a_interval'][0] <= summary['a_win_rate'] <= summary['a_interval'][1]
+
+
+def test_record_is_closed_when_a_match_fails(tmp_path, monkeypatch):
+    closed = []
+
+    class Writer(game_record.RecordWriter):
+        def close(self):
+            closed.append(True)
+            super().close()
+    monkeypatch.setattr(game_record, 'RecordWriter', Writer)
+    with pytest.raises(TypeError):
+        tournament.run(2, ({'no_such_option': 1}, {}), {'depth': 1}, workers=1, stream=None,
+                       record_path=str(tmp_path / 'games.kmgr'))
+    assert closed
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+import game
+import engine
+from bitboard import BitBoard, mirror_square
+from transposition import TranspositionTable, EXACT, LOWER
+
+
+class NoTable(TranspositionTable):
+    def probe(self, key):
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        pass
+
+
+def random_position(seed, plies):
+    rng = random.Random(seed)
+    board = game.Board()
+    board.set_color(rng.randrange(game.BLEN))
+    for _ in range(plies):
+        if board.round_over:
+            break
+        board.perform_move(rng.choice(board.get_legal_moves()))
+    return board
+
+
+def test_memory_cap():
+    table = TranspositionTable(megabytes=1)
+    assert table.size & table.mask == 0
+    assert table.size * 144 <= 2 ** 20 < table.size * 2 * 144
+
+
+def test_probe_counters():
+    table = TranspositionTable(megabytes=1)
+    assert table.probe(5) is None
+    table.store(5, 3, EXACT, 1.5, 12)
+    assert table.probe(5) == (3, EXACT, 1.5, 12)
+    assert table.probe(5 + table.size) is None
+    assert (table.hits, table.misses, table.collisions) == (1, 2, 1)
+
+
+def test_replacement_prefers_depth_within_search():
+    table = TranspositionTable(megabytes=1)
+    table.store(7, 5, EXACT, 0, 1)
+    table.store(7 + table.size, 2, LOWER, 0, 2)
+    assert table.probe(7) == (5, EXACT, 0, 1)
+    table.store(7, 1, LOWER, 3, 4)
+    assert table.probe(7) == (1, LOWER, 3, 4)
+    table.new_search()
+    table.store(7 + table.size, 2, LOWER, 0, 2)
+    assert table.probe(7 + table.size) == (2, LOWER, 0, 2)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_table_keeps_search_scores(seed):
+    board = random_position(seed, plies=seed % 4 + 1)
+    if board.round_over:
+        pytest.skip('random game ended early')
+    for depth in (1, 2, 3):
+        with_table = engine.Engine()
+        without_table = engine.Engine()
+        without_table.table = NoTable(0)
+        score = with_table.search(BitBoard.from_board(board), depth, 0, -engine.Engine.INF, engine.Engine.INF)
+        assert score == without_table.search(BitBoard.from_board(board), depth, 0,
+                                             -engine.Engine.INF, engine.Engine.INF)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_mirrored_search_reuses_table(seed):
+    board = random_position(seed, plies=2)
+    if board.round_over:
+        pytest.skip('random game ended early')
+    bot = engine.Engine()
+    bboard = BitBoard.from_board(board)
+    score = bot.search(bboard, 3, 0, -engine.Engine.INF, engine.Engine.INF)
+    best_move = bot.current_best_move
+    hits = bot.table.hits
+    assert bot.search(bboard.mirrored(), 3, 0, -engine.Engine.INF, engine.Engine.INF) == score
+    assert bot.current_best_move == mirror_square(best_move)
+    assert bot.table.hits > hits